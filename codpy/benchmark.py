@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import numpy as np
+
+import cv2
+
+import codpy.file_handling as fh
+
+
+def synthImg(height,
+             width,
+             nUncolObj,
+             nColObj,
+             radius = 10,
+             colH = 170,
+             seed = 0):
+    """
+    Generate synthetic image with known numbers of uncolored and colored
+    round objects on a light background. Objects do not overlap.
+
+    Parameters
+    ----------
+    height : int
+        image height.
+    width : int
+        image width.
+    nUncolObj : int
+        number of uncolored (grey) objects.
+    nColObj : int
+        number of colored objects.
+    radius : int, optional
+        object radius. The default is 10.
+    colH : int, optional
+        H color value of colored objects. The default is 170.
+    seed : int, optional
+        seed of random object positions. The default is 0.
+
+    Returns
+    -------
+    img : numpy array
+        synthetic BGR image.
+
+    """
+
+    rng = np.random.default_rng(seed)
+
+    # light, slightly noisy background
+    img = np.full((height, width, 3), 220, np.uint8)
+    img += rng.integers(0, 8, img.shape, np.uint8)
+
+    # place objects in distinct cells of a regular grid
+    cell = 3 * radius
+    nX = width // cell
+    nY = height // cell
+    nObj = nUncolObj + nColObj
+    if nObj > nX * nY:
+        raise ValueError("Too many objects for image size.")
+
+    cells = rng.choice(nX * nY, nObj, replace = False)
+
+    # BGR color of colored objects
+    colBGR = cv2.cvtColor(np.uint8([[[colH, 200, 200]]]), cv2.COLOR_HSV2BGR)
+    colBGR = tuple(int(c) for c in colBGR[0, 0])
+
+    for i, c in enumerate(cells):
+        center = (int((c % nX) * cell + cell // 2),
+                  int((c // nX) * cell + cell // 2))
+        color = colBGR if i < nColObj else (90, 90, 90)
+        cv2.circle(img, center, radius, color, -1)
+
+    return img
+
+
+def gitCommit():
+    """
+    Get current git commit of working directory, if any.
+
+    Returns
+    -------
+    commit : string or None
+        commit hash.
+
+    """
+
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'],
+                              capture_output = True,
+                              text = True,
+                              check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def runStages(detector, imgDir, imgFile):
+    """
+    Run detection pipeline once on an image and time each stage.
+
+    Parameters
+    ----------
+    detector : ContourDetector
+        detector to benchmark.
+    imgDir : string
+        path to image directory.
+    imgFile : string
+        image filename.
+
+    Returns
+    -------
+    times : dict
+        time of each stage in seconds.
+    contours : list
+        extracted contours.
+    uncObjCen : list
+        centers of uncolored objects.
+    colObjCen : list
+        centers of colored objects.
+
+    """
+
+    t0 = time.perf_counter()
+    imgIn = fh.readImgIn(imgDir, imgFile)
+    t1 = time.perf_counter()
+    contours = detector.extractContours(imgIn)
+    t2 = time.perf_counter()
+    centers = detector.extractCenters(contours)
+    t3 = time.perf_counter()
+    uncObjCen, colObjCen = detector.selectColObjCen(imgIn,
+                                                    contours,
+                                                    centers)
+    t4 = time.perf_counter()
+    imgOut = detector.markCenters(imgIn, uncObjCen, colObjCen)
+    fh.saveImgOut(imgDir, imgFile, imgOut)
+    t5 = time.perf_counter()
+
+    times = {'readImgIn': t1 - t0,
+             'extractContours': t2 - t1,
+             'extractCenters': t3 - t2,
+             'selectColObjCen': t4 - t3,
+             'saveImgOut': t5 - t4}
+
+    return times, contours, uncObjCen, colObjCen
+
+
+def benchmark(detector,
+              sizes = [(512, 512), (2048, 2048)],
+              densities = [10, 100],
+              repeat = 3,
+              outPath = None):
+    """
+    Benchmark the detection pipeline of a contour detector on synthetic
+    images. Each stage is timed separately. For each image size and object
+    density, best times of all repetitions, images per second and peak
+    memory are reported. Peak memory is traced in a separate pass, so that
+    tracing does not distort times.
+
+    Parameters
+    ----------
+    detector : ContourDetector
+        detector to benchmark.
+    sizes : list, optional
+        image sizes (height, width). The default is [(512, 512), (2048, 2048)].
+    densities : list, optional
+        number of objects per megapixel, half of them colored.
+        The default is [10, 100].
+    repeat : int, optional
+        number of repetitions per case. The default is 3.
+    outPath : string, optional
+        path of JSON file to write report to. The default is None.
+
+    Returns
+    -------
+    report : dict
+        benchmark report.
+
+    """
+
+    cases = []
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        for height, width in sizes:
+            for density in densities:
+
+                # known numbers of objects
+                nObj = max(1, int(density * height * width / 1e6))
+                nColObj = nObj // 2
+
+                imgFile = 'synth_' + str(height) + 'x' + str(width) + '.jpg'
+                img = synthImg(height,
+                               width,
+                               nObj - nColObj,
+                               nColObj,
+                               colH = detector.meanRefH)
+                cv2.imwrite(os.path.join(tmpDir, imgFile), img)
+
+                times = {'readImgIn': [],
+                         'extractContours': [],
+                         'extractCenters': [],
+                         'selectColObjCen': [],
+                         'saveImgOut': []}
+
+                # time stages without tracing, which slows Python code
+                for _ in range(repeat):
+                    stageTimes, contours, uncObjCen, colObjCen = runStages(detector,
+                                                                           tmpDir,
+                                                                           imgFile)
+                    for stage, t in stageTimes.items():
+                        times[stage].append(t)
+
+                # measure peak memory in separate traced pass
+                tracemalloc.start()
+                runStages(detector, tmpDir, imgFile)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                # best time of each stage
+                stages = {stage: min(t) for stage, t in times.items()}
+                total = sum(stages.values())
+
+                cases.append({'height': height,
+                              'width': width,
+                              'density': density,
+                              'nObj': nObj,
+                              'nColObj': nColObj,
+                              'nContours': len(contours),
+                              'nDetObj': len(uncObjCen) + len(colObjCen),
+                              'nDetColObj': len(colObjCen),
+                              'stages': stages,
+                              'total': total,
+                              'imgPerSec': 1. / total if total > 0 else None,
+                              'peakMemory': peak})
+
+    report = {'commit': gitCommit(),
+              'python': sys.version.split()[0],
+              'numpy': np.__version__,
+              'opencv': cv2.__version__,
+              'platform': platform.platform(),
+              'detector': type(detector).__name__,
+              'repeat': repeat,
+              'cases': cases}
+
+    if outPath is not None:
+        with open(outPath, 'w') as outFile:
+            json.dump(report, outFile, indent = 2)
+
+    return report
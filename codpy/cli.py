@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import argparse
+
+from codpy.contour_detector import ContourDetector
+from codpy.component_detector import ComponentDetector
+from codpy.color_mask_detector import ColorMaskDetector
+
+
+def parseArgs(argv = None):
+    """
+    Parse command line arguments of headless detection.
+
+    Parameters
+    ----------
+    argv : list, optional
+        command line arguments. The default is None, i.e. sys.argv.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        parsed arguments.
+
+    """
+    
+    parser = argparse.ArgumentParser(
+        prog = 'codpy',
+        description = 'Headless colored object detection. Detects objects '
+                      'in all images of the input directory, without any '
+                      'image windows, and writes marked images and results '
+                      'to the output directory.')
+    
+    parser.add_argument('inDir', nargs = '?', default = 'data',
+                        help = 'input directory, stack file with --stack or '
+                               'video file or camera index with --video '
+                               '(default: data)')
+    parser.add_argument('outDir', nargs = '?', default = 'results',
+                        help = 'output directory (default: results)')
+    
+    parser.add_argument('--detector', default = 'contour',
+                        choices = ['contour', 'component', 'colormask'],
+                        help = 'object detector (default: contour)')
+    parser.add_argument('--meanRefH', type = float, default = 150,
+                        help = 'mean of reference H color value')
+    parser.add_argument('--stdRefH', type = float, default = 10,
+                        help = 'standard deviation of reference H color value')
+    parser.add_argument('--factor', type = float, default = 1.,
+                        help = 'color limit factor')
+    parser.add_argument('--boxSize', type = float, default = 10,
+                        help = 'side length of bounding boxes')
+    parser.add_argument('--lineWidth', type = int, default = 2,
+                        help = 'line width of bounding boxes')
+    parser.add_argument('--stdX', type = int, default = 5,
+                        help = 'x standard deviation of Gaussian blur')
+    parser.add_argument('--stdY', type = int, default = 5,
+                        help = 'y standard deviation of Gaussian blur')
+    parser.add_argument('--loThresh', type = int, default = 100,
+                        help = 'lower threshold for edge detection')
+    parser.add_argument('--hiThresh', type = int, default = 200,
+                        help = 'higher threshold for edge detection')
+    parser.add_argument('--dilIter', type = int, default = 2,
+                        help = 'number of dilation iterations')
+    parser.add_argument('--eroIter', type = int, default = 2,
+                        help = 'number of erosion iterations')
+    
+    parser.add_argument('--scale', type = float, default = 1.,
+                        help = 'scale factor of image for edge detection '
+                               '(contour)')
+    parser.add_argument('--noRefine', action = 'store_true',
+                        help = 'get mean colors at detection scale instead '
+                               'of full resolution (contour)')
+    parser.add_argument('--minS', type = int, default = 50,
+                        help = 'minimum S color value (colormask)')
+    parser.add_argument('--minV', type = int, default = 50,
+                        help = 'minimum V color value (colormask)')
+    parser.add_argument('--openIter', type = int, default = 1,
+                        help = 'number of opening iterations (colormask)')
+    parser.add_argument('--closeIter', type = int, default = 2,
+                        help = 'number of closing iterations (colormask)')
+    parser.add_argument('--minArea', type = int, default = 0,
+                        help = 'minimum object area (colormask)')
+    
+    parser.add_argument('--tileSize', type = int, default = None,
+                        help = 'side length of tiles to detect objects in '
+                               'separately')
+    parser.add_argument('--tileOverlap', type = int, default = 64,
+                        help = 'overlap of tiles, exceeding object size')
+    
+    parser.add_argument('--workers', type = int, default = 1,
+                        help = 'number of worker processes')
+    parser.add_argument('--pattern', action = 'append', default = None,
+                        dest = 'patterns',
+                        help = 'glob pattern of image paths relative to '
+                               'inDir, may be repeated')
+    parser.add_argument('--recursive', action = 'store_true',
+                        help = 'include images in subdirectories')
+    parser.add_argument('--stack', action = 'store_true',
+                        help = 'read frames from memory mapped .npy or raw '
+                               'stack file inDir')
+    parser.add_argument('--frameShape', type = int, nargs = 2, default = None,
+                        metavar = ('H', 'W'),
+                        help = 'frame height and width of raw stack file')
+    parser.add_argument('--video', action = 'store_true',
+                        help = 'read frames from video file or camera inDir')
+    parser.add_argument('--diffThresh', type = int, default = None,
+                        help = 'maximum pixel difference of video regions to '
+                               'reuse objects of their last detection')
+    parser.add_argument('--regionSize', type = int, default = 256,
+                        help = 'side length of video regions (default: 256)')
+    parser.add_argument('--maxFrames', type = int, default = None,
+                        help = 'maximum number of video frames')
+    parser.add_argument('--objects', default = None,
+                        choices = ['npy', 'parquet'],
+                        help = 'write table of all object records in given '
+                               'format')
+    parser.add_argument('--prefetch', type = int, default = 2,
+                        help = 'number of images to read ahead and save in '
+                               'background (0: synchronous)')
+    parser.add_argument('--resume', action = 'store_true',
+                        help = 'skip unchanged images processed before')
+    parser.add_argument('--cacheDir', default = None,
+                        help = 'directory to cache extracted contours in')
+    parser.add_argument('--profile', default = None,
+                        help = '1 to time stages, cprofile to also capture '
+                               'a cProfile')
+    
+    return parser.parse_args(argv)
+
+
+def main(argv = None):
+    """
+    Run headless detection from the command line.
+
+    Parameters
+    ----------
+    argv : list, optional
+        command line arguments. The default is None, i.e. sys.argv.
+
+    Returns
+    -------
+    None.
+
+    """
+    
+    args = parseArgs(argv)
+    
+    if args.detector == 'colormask':
+        detector = ColorMaskDetector(meanRefH = args.meanRefH,
+                                     stdRefH = args.stdRefH,
+                                     factor = args.factor,
+                                     boxSize = args.boxSize,
+                                     lineWidth = args.lineWidth,
+                                     minS = args.minS,
+                                     minV = args.minV,
+                                     openIter = args.openIter,
+                                     closeIter = args.closeIter,
+                                     minArea = args.minArea,
+                                     profile = args.profile,
+                                     tileSize = args.tileSize,
+                                     tileOverlap = args.tileOverlap)
+    elif args.detector == 'component':
+        detector = ComponentDetector(meanRefH = args.meanRefH,
+                                     stdRefH = args.stdRefH,
+                                     factor = args.factor,
+                                     boxSize = args.boxSize,
+                                     lineWidth = args.lineWidth,
+                                     stdX = args.stdX,
+                                     stdY = args.stdY,
+                                     loThresh = args.loThresh,
+                                     hiThresh = args.hiThresh,
+                                     dilIter = args.dilIter,
+                                     eroIter = args.eroIter,
+                                     profile = args.profile,
+                                     tileSize = args.tileSize,
+                                     tileOverlap = args.tileOverlap)
+    else:
+        detector = ContourDetector(meanRefH = args.meanRefH,
+                                   stdRefH = args.stdRefH,
+                                   factor = args.factor,
+                                   boxSize = args.boxSize,
+                                   lineWidth = args.lineWidth,
+                                   stdX = args.stdX,
+                                   stdY = args.stdY,
+                                   loThresh = args.loThresh,
+                                   hiThresh = args.hiThresh,
+                                   dilIter = args.dilIter,
+                                   eroIter = args.eroIter,
+                                   cacheDir = args.cacheDir,
+                                   profile = args.profile,
+                                   scale = args.scale,
+                                   refine = not args.noRefine,
+                                   tileSize = args.tileSize,
+                                   tileOverlap = args.tileOverlap)
+    
+    if args.video:
+        # camera index or video file
+        source = int(args.inDir) if args.inDir.isdigit() else args.inDir
+        summary = detector.detectVideo(source,
+                                       relOutDir = os.path.relpath(args.outDir),
+                                       regionSize = args.regionSize,
+                                       diffThresh = args.diffThresh,
+                                       maxFrames = args.maxFrames,
+                                       objects = args.objects)
+        print(str(summary['frames']) + ' frames at ' +
+              str(round(summary['fps'], 1)) + ' fps')
+        return
+    
+    if args.stack:
+        detector.detectStack(args.inDir,
+                             relOutDir = os.path.relpath(args.outDir),
+                             frameShape = args.frameShape,
+                             workers = args.workers,
+                             objects = args.objects)
+        return
+    
+    # directories are taken relative to working dir
+    detector.detect(relInDir = os.path.relpath(args.inDir),
+                    relOutDir = os.path.relpath(args.outDir),
+                    interactive = False,
+                    workers = args.workers,
+                    resume = args.resume,
+                    prefetch = args.prefetch,
+                    patterns = args.patterns,
+                    recursive = args.recursive,
+                    objects = args.objects)
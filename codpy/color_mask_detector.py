@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import math
+import numpy as np
+import cv2
+
+import codpy.records as rec
+from codpy.detector import Detector
+
+
+class ColorMaskDetector(Detector):
+    """
+    Class of colored object detector by thresholding H color values.
+    Skips edge detection. Pixels with H value within the reference limits
+    are masked, cleaned morphologically and labeled as objects, so all
+    detected objects are colored.
+
+    """
+
+    def __init__(self,
+                 meanRefH = 150,
+                 stdRefH = 10,
+                 factor = 1.,
+                 boxSize = 10,
+                 lineWidth = 2,
+                 minS = 50,
+                 minV = 50,
+                 openIter = 1,
+                 closeIter = 2,
+                 minArea = 0,
+                 profile = None,
+                 tileSize = None,
+                 tileOverlap = 64):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        meanRefH : float, optional
+            mean of reference H color value. The default is 150.
+        stdRefH : float, optional
+            standard deviation of reference H color value. The default is 10.
+        factor : float, optional
+            color limit factor in colored object detection.
+        boxSize : int, optional
+            side length of bounding boxes. The default is 10.
+        lineWidth : int, optional
+            line width of bounding boxes. The default is 2.
+        minS : int, optional
+            minimum S color value of colored pixels. The default is 50.
+        minV : int, optional
+            minimum V color value of colored pixels. The default is 50.
+        openIter : int, optional
+            number of opening iterations to remove specks. The default is 1.
+        closeIter : int, optional
+            number of closing iterations to close gaps. The default is 2.
+        minArea : int, optional
+            minimum object area in pixels. The default is 0.
+        profile : bool or string, optional
+            True to time pipeline stages, "cprofile" to also capture a
+            cProfile. The default is None, i.e. read from environment
+            variable CODPY_PROFILE.
+        tileSize : int, optional
+            side length of tiles to detect objects in separately, bounding
+            memory of detection by tile size. The default is None, i.e.
+            detect in whole image.
+        tileOverlap : int, optional
+            overlap of neighbouring tiles. Has to exceed object size.
+            The default is 64.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        # call inherited constructor
+        Detector.__init__(self,
+                          meanRefH,
+                          stdRefH,
+                          factor,
+                          boxSize,
+                          lineWidth,
+                          profile,
+                          tileSize,
+                          tileOverlap)
+
+        # additional variables for color mask detection
+        self.minS = minS
+        self.minV = minV
+        self.openIter = openIter
+        self.closeIter = closeIter
+        self.minArea = minArea
+
+    def hueRanges(self):
+        """
+        Get ranges of H color values within reference limits. OpenCV H
+        values lie in [0, 179], limits beyond are wrapped around.
+
+        Returns
+        -------
+        ranges : list
+            inclusive (low, high) H ranges.
+
+        """
+
+        loH = math.ceil(self.meanRefH - self.factor * self.stdRefH)
+        hiH = math.floor(self.meanRefH + self.factor * self.stdRefH)
+
+        # limits cover all H values
+        if hiH - loH >= 179:
+            return [(0, 179)]
+
+        loH %= 180
+        hiH %= 180
+
+        if loH <= hiH:
+            return [(loH, hiH)]
+
+        # range wraps around from 179 to 0
+        return [(loH, 179), (0, hiH)]
+
+    def colorMask(self, imgHSV):
+        """
+        Mask pixels with H color value within reference limits.
+
+        Parameters
+        ----------
+        imgHSV : numpy array
+            input image in HSV scale.
+
+        Returns
+        -------
+        mask : numpy array
+            binary color mask.
+
+        """
+
+        mask = None
+
+        for loH, hiH in self.hueRanges():
+            maskRange = cv2.inRange(imgHSV,
+                                    (loH, self.minS, self.minV),
+                                    (hiH, 255, 255))
+            if mask is None:
+                mask = maskRange
+            else:
+                mask = cv2.bitwise_or(mask, maskRange)
+
+        # remove specks and close gaps
+        if self.openIter > 0:
+            mask = cv2.morphologyEx(mask,
+                                    cv2.MORPH_OPEN,
+                                    None,
+                                    iterations = self.openIter)
+        if self.closeIter > 0:
+            mask = cv2.morphologyEx(mask,
+                                    cv2.MORPH_CLOSE,
+                                    None,
+                                    iterations = self.closeIter)
+
+        return mask
+
+    def detectObjects(self, imgIn):
+        """
+        Detect colored objects by thresholding H color values.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+
+        Returns
+        -------
+        objs : numpy array
+            object records.
+
+        """
+
+        prof = self.profiler
+
+        # mask and label colored pixels
+        with prof.stage('colorMask'):
+            imgHSV = self.hsvImg(imgIn)
+            mask = self.colorMask(imgHSV)
+            nLabels, labels, stats, centroids = cv2.connectedComponentsWithStats(
+                mask,
+                connectivity = 8,
+                ltype = cv2.CV_32S)
+
+        with prof.stage('extractObjects'):
+            objs = rec.newObjects(nLabels - 1)
+            objs['x'] = stats[1:, cv2.CC_STAT_LEFT]
+            objs['y'] = stats[1:, cv2.CC_STAT_TOP]
+            objs['w'] = stats[1:, cv2.CC_STAT_WIDTH]
+            objs['h'] = stats[1:, cv2.CC_STAT_HEIGHT]
+            objs['area'] = stats[1:, cv2.CC_STAT_AREA]
+            objs['cx'] = centroids[1:, 0]
+            objs['cy'] = centroids[1:, 1]
+            objs['perimeter'] = np.nan
+
+            # mean H relative to lower limit, so wrapped ranges stay contiguous
+            loH = self.hueRanges()[0][0]
+            imgH = (imgHSV[:, :, 0].astype(np.int16) - loH) % 180
+            meanH = (self.meanLabelH(imgH[:, :, None], labels, nLabels) + loH) % 180
+
+            objs['meanH'] = meanH
+            objs['colored'] = True
+
+            # drop small objects
+            objs = objs[objs['area'] >= self.minArea]
+
+        prof.count('components', nLabels - 1)
+
+        return objs
+
+    def parameters(self):
+        """
+        Get used detection parameters.
+
+        Returns
+        -------
+        params : list
+            (name, value) of each parameter.
+
+        """
+
+        return Detector.parameters(self) + [('minS', self.minS),
+                                           ('minV', self.minV),
+                                           ('openIter', self.openIter),
+                                           ('closeIter', self.closeIter),
+                                           ('minArea', self.minArea)]
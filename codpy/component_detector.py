@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import cv2
+
+import codpy.records as rec
+from codpy.contour_detector import ContourDetector
+
+
+class ComponentDetector(ContourDetector):
+    """
+    Class of object detector by connected component labeling.
+    Uses the edge detection of ContourDetector, but labels the filled edge
+    mask instead of tracing contours. Boxes, areas, centroids and mean
+    colors of all objects are obtained from the label image at once.
+    Each closed edge counts as one object, including its interior.
+
+    """
+
+    def __init__(self,
+                 meanRefH = 150,
+                 stdRefH = 10,
+                 factor = 1.,
+                 boxSize = 10,
+                 lineWidth = 2,
+                 stdX = 5,
+                 stdY = 5,
+                 loThresh = 100,
+                 hiThresh = 200,
+                 dilIter = 2,
+                 eroIter = 2,
+                 profile = None,
+                 tileSize = None,
+                 tileOverlap = 64):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        meanRefH : float, optional
+            mean of reference H color value. The default is 150.
+        stdRefH : float, optional
+            standard deviation of reference H color value. The default is 10.
+        factor : float, optional
+            color limit factor in colored object detection.
+        boxSize : int, optional
+            side length of bounding boxes. The default is 10.
+        lineWidth : int, optional
+            line width of bounding boxes. The default is 2.
+        stdX : int, optional
+            x standard deviation of Gaussian blur for edge detection. The default is 5.
+        stdY : int, optional
+            y standard deviation of Gaussian blur for edge detection. The default is 5.
+        loThresh : int, optional
+            lower threshold for edge detection. The default is 100.
+        hiThresh : int, optional
+            higher threshold for edge detection. The default is 200.
+        dilIter : int, optional
+            number of dilation iterations for edges. The default is 2.
+        eroIter : int, optional
+            number of erosion iterations for edges. The default is 2.
+        profile : bool or string, optional
+            True to time pipeline stages, "cprofile" to also capture a
+            cProfile. The default is None, i.e. read from environment
+            variable CODPY_PROFILE.
+        tileSize : int, optional
+            side length of tiles to detect objects in separately, bounding
+            memory of detection by tile size. The default is None, i.e.
+            detect in whole image.
+        tileOverlap : int, optional
+            overlap of neighbouring tiles. Has to exceed object size.
+            The default is 64.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        # call inherited constructor
+        ContourDetector.__init__(self,
+                                 meanRefH,
+                                 stdRefH,
+                                 factor,
+                                 boxSize,
+                                 lineWidth,
+                                 stdX,
+                                 stdY,
+                                 loThresh,
+                                 hiThresh,
+                                 dilIter,
+                                 eroIter,
+                                 profile = profile,
+                                 tileSize = tileSize,
+                                 tileOverlap = tileOverlap)
+
+    def objectMask(self, imgIn):
+        """
+        Get mask of objects, i.e. closed edges with filled interiors.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+
+        Returns
+        -------
+        imgFilled : numpy array
+            binary object mask.
+
+        """
+
+        imgEdges = self.edgeMask(imgIn)
+
+        # background is everything outside edges, reachable from border
+        imgBack = cv2.copyMakeBorder(imgEdges,
+                                     1, 1, 1, 1,
+                                     cv2.BORDER_CONSTANT,
+                                     value = 0,
+                                     dst = self.workspace.buffer(
+                                         'background',
+                                         (imgEdges.shape[0] + 2,
+                                          imgEdges.shape[1] + 2)))
+        cv2.bitwise_not(imgBack, dst = imgBack)
+        cv2.floodFill(imgBack, None, (0, 0), 0)
+
+        # fill enclosed holes in edge buffer
+        imgFilled = cv2.bitwise_or(imgEdges,
+                                   imgBack[1:-1, 1:-1],
+                                   dst = imgEdges)
+
+        return imgFilled
+
+    def extractComponents(self, imgIn):
+        """
+        Label connected objects in input image.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+
+        Returns
+        -------
+        nLabels : int
+            number of labels including background label 0.
+        labels : numpy array
+            label image.
+        stats : numpy array
+            bounding box and area of each label.
+        centroids : numpy array
+            centroid of each label.
+
+        """
+
+        return cv2.connectedComponentsWithStats(self.objectMask(imgIn),
+                                                connectivity = 8,
+                                                ltype = cv2.CV_32S)
+
+    def detectObjects(self, imgIn):
+        """
+        Detect uncolored and colored objects by connected component labeling.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+
+        Returns
+        -------
+        objs : numpy array
+            object records.
+
+        """
+
+        prof = self.profiler
+
+        # label objects
+        with prof.stage('extractComponents'):
+            nLabels, labels, stats, centroids = self.extractComponents(imgIn)
+
+        # object records without background label
+        with prof.stage('extractObjects'):
+            objs = rec.newObjects(nLabels - 1)
+            objs['x'] = stats[1:, cv2.CC_STAT_LEFT]
+            objs['y'] = stats[1:, cv2.CC_STAT_TOP]
+            objs['w'] = stats[1:, cv2.CC_STAT_WIDTH]
+            objs['h'] = stats[1:, cv2.CC_STAT_HEIGHT]
+            objs['area'] = stats[1:, cv2.CC_STAT_AREA]
+            objs['cx'] = centroids[1:, 0]
+            objs['cy'] = centroids[1:, 1]
+            objs['perimeter'] = np.nan
+
+        # get mean colors from label image and select colored objects
+        with prof.stage('colorObjects'):
+            imgHSV = self.hsvImg(imgIn)
+            objs = self.colorObjects(objs,
+                                     self.meanLabelH(imgHSV, labels, nLabels))
+
+        prof.count('components', nLabels - 1)
+
+        return objs
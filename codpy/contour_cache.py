@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import hashlib
+import numpy as np
+
+
+class ContourCache():
+    """
+    Class of content-addressed on-disk cache for extracted contours.
+    Entries are keyed by image content and edge detection parameters and
+    evicted least recently used, once the cache exceeds its size limit.
+
+    """
+
+    def __init__(self, cacheDir, maxBytes = 2**30):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        cacheDir : string
+            path to cache directory.
+        maxBytes : int, optional
+            size limit of cache in bytes. The default is 2**30.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+
+        # check, if cache dir exists
+        if not os.path.isdir(self.cacheDir):
+            os.makedirs(self.cacheDir)
+
+        # current cache size
+        self.nBytes = sum(entry.stat().st_size
+                          for entry in os.scandir(self.cacheDir)
+                          if entry.name.endswith('.npz'))
+
+    def key(self, imgIn, param):
+        """
+        Get cache key of image and parameters.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+        param : tuple
+            parameters used in contour extraction.
+
+        Returns
+        -------
+        key : string
+            hex digest of image content and parameters.
+
+        """
+
+        h = hashlib.blake2b(digest_size = 20)
+        h.update(repr((imgIn.shape, str(imgIn.dtype), param)).encode())
+        h.update(np.ascontiguousarray(imgIn).data)
+
+        return h.hexdigest()
+
+    def load(self, key):
+        """
+        Load contours from cache.
+
+        Parameters
+        ----------
+        key : string
+            cache key.
+
+        Returns
+        -------
+        contours : list or None
+            cached contours. None, if not in cache.
+
+        """
+
+        path = os.path.join(self.cacheDir, key + '.npz')
+
+        try:
+            with np.load(path) as entry:
+                points = entry['points']
+                lengths = entry['lengths']
+        except (OSError, KeyError, ValueError):
+            return None
+
+        # mark entry as recently used
+        os.utime(path)
+
+        # entries of images without contours
+        if len(lengths) == 0:
+            return []
+
+        # split concatenated points into single contours
+        points = points.astype(np.int32).reshape(-1, 1, 2)
+
+        return list(np.split(points, np.cumsum(lengths)[:-1]))
+
+    def save(self, key, contours):
+        """
+        Save contours to cache, packed into a single point array.
+
+        Parameters
+        ----------
+        key : string
+            cache key.
+        contours : list
+            object contours.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        path = os.path.join(self.cacheDir, key + '.npz')
+
+        lengths = np.array([len(c) for c in contours], np.int64)
+        if len(contours) > 0:
+            points = np.concatenate(contours).reshape(-1, 2)
+        else:
+            points = np.zeros((0, 2), np.int32)
+
+        # smaller integers suffice for most images
+        if points.size == 0 or points.max() < 2**15:
+            points = points.astype(np.int16)
+
+        # write to temp file and move, so readers never see partial entries
+        tmpPath = path + '.' + str(os.getpid()) + '.tmp'
+        with open(tmpPath, 'wb') as entryFile:
+            np.savez_compressed(entryFile, points = points, lengths = lengths)
+        os.replace(tmpPath, path)
+
+        self.nBytes += os.path.getsize(path)
+
+        if self.nBytes > self.maxBytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used entries until cache fits its size limit.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        entries = [entry for entry in os.scandir(self.cacheDir)
+                   if entry.name.endswith('.npz')]
+
+        # oldest entries first
+        entries.sort(key = lambda entry: entry.stat().st_mtime_ns)
+
+        self.nBytes = sum(entry.stat().st_size for entry in entries)
+
+        for entry in entries:
+            if self.nBytes <= self.maxBytes:
+                break
+
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                # already removed by another process
+                continue
+
+            self.nBytes -= size
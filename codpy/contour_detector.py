@@ -8,10 +8,18 @@ Created on Thu Aug  5 13:33:15 2021
 
 
 import os
+import copy
+import time
+import numpy as np
 import cv2
 
 import codpy.file_handling as fh
+import codpy.records as rec
 from codpy.detector import Detector
+from codpy.contour_cache import ContourCache
+from codpy.spatial_index import SpatialIndex
+from codpy.profiler import Profiler
+from codpy.workspace import Workspace
 
 
 class ContourDetector(Detector):
@@ -32,7 +40,14 @@ class ContourDetector(Detector):
                  loThresh = 100,
                  hiThresh = 200,
                  dilIter = 2,
-                 eroIter = 2):
+                 eroIter = 2,
+                 cacheDir = None,
+                 cacheSize = 2**30,
+                 profile = None,
+                 scale = 1.,
+                 refine = True,
+                 tileSize = None,
+                 tileOverlap = 64):
         """
         Constructor.
 
@@ -60,6 +75,29 @@ class ContourDetector(Detector):
             number of dilation iterations for edges. The default is 2.
         eroIter : int, optional
             number of erosion iterations for edges. The default is 2.
+        cacheDir : string, optional
+            directory to cache extracted contours in. The default is None,
+            i.e. no caching.
+        cacheSize : int, optional
+            size limit of contour cache in bytes. The default is 2**30.
+        profile : bool or string, optional
+            True to time pipeline stages, "cprofile" to also capture a
+            cProfile. The default is None, i.e. read from environment
+            variable CODPY_PROFILE.
+        scale : float, optional
+            scale factor of image for edge detection. Contours found on the
+            downscaled image are mapped back to full resolution.
+            The default is 1., i.e. full resolution.
+        refine : bool, optional
+            get mean colors at full resolution inside mapped contours.
+            Otherwise, use downscaled image. The default is True.
+        tileSize : int, optional
+            side length of tiles to detect objects in separately, bounding
+            memory of detection by tile size. The default is None, i.e.
+            detect in whole image.
+        tileOverlap : int, optional
+            overlap of neighbouring tiles. Has to exceed object size.
+            The default is 64.
             
         Returns
         -------
@@ -73,7 +111,10 @@ class ContourDetector(Detector):
                           stdRefH,
                           factor,
                           boxSize,
-                          lineWidth)
+                          lineWidth,
+                          profile,
+                          tileSize,
+                          tileOverlap)
         
         # additional variables for contour detection
         self.stdX = stdX
@@ -82,6 +123,15 @@ class ContourDetector(Detector):
         self.hiThresh = hiThresh 
         self.dilIter = dilIter
         self.eroIter = eroIter
+        
+        # multi-scale detection
+        self.scale = scale
+        self.refine = refine
+        
+        # optional cache of extracted contours
+        self.cache = None
+        if cacheDir is not None:
+            self.cache = ContourCache(cacheDir, cacheSize)
 
     def extractContours(self, imgIn):
         """
@@ -99,32 +149,185 @@ class ContourDetector(Detector):
 
         """
         
+        # look up contours of same image and edge parameters in cache
+        if self.cache is not None:
+            key = self.cache.key(imgIn, self.edgeParameters())
+            contours = self.cache.load(key)
+            
+            if contours is None:
+                contours = self.findContours(imgIn)
+                self.cache.save(key, contours)
+            
+            return contours
+        
+        return self.findContours(imgIn)
+    
+    def edgeParameters(self):
+        """
+        Get parameters used in contour extraction.
+
+        Returns
+        -------
+        param : tuple
+            edge detection parameters.
+
+        """
+        
+        return (self.stdX,
+                self.stdY,
+                self.loThresh,
+                self.hiThresh,
+                self.dilIter,
+                self.eroIter,
+                self.scale)
+    
+    def findContours(self, imgIn):
+        """
+        Find object contours in input image by edge detection.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+            
+        Returns
+        -------
+        contours : list
+            object contours.
+
+        """
+        
+        if self.scale != 1:
+            # find contours on downscaled image and map them back
+            contours, _ = cv2.findContours(self.edgeMask(self.downscale(imgIn)),
+                                           cv2.RETR_TREE,
+                                           cv2.CHAIN_APPROX_SIMPLE)
+            
+            return self.mapContours(contours, 1. / self.scale, imgIn.shape)
+        
+        # find contours based on detected edges
+        contours, _ = cv2.findContours(self.edgeMask(imgIn),
+                                       cv2.RETR_TREE,
+                                       cv2.CHAIN_APPROX_SIMPLE)
+    
+        return contours
+    
+    def downscale(self, imgIn):
+        """
+        Downscale image by scale factor.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+
+        Returns
+        -------
+        imgSmall : numpy array
+            downscaled image.
+
+        """
+        
+        return cv2.resize(imgIn,
+                          None,
+                          fx = self.scale,
+                          fy = self.scale,
+                          interpolation = cv2.INTER_AREA)
+    
+    def mapContours(self, contours, factor, shape):
+        """
+        Map contours to image of another scale. Pixel centers are mapped
+        onto each other.
+
+        Parameters
+        ----------
+        contours : list
+            object contours.
+        factor : float
+            scale factor from source to target image.
+        shape : tuple
+            target image shape.
+
+        Returns
+        -------
+        contours : list
+            mapped contours.
+
+        """
+        
+        upper = np.array([shape[1] - 1, shape[0] - 1])
+        
+        return [np.clip(np.rint((c + 0.5) * factor - 0.5), 0, upper).astype(np.int32)
+                for c in contours]
+    
+    def blurKernel(self):
+        """
+        Get Gaussian blur kernel size at detection scale.
+
+        Returns
+        -------
+        kernel : tuple
+            odd kernel size in x and y.
+
+        """
+        
+        if self.scale == 1:
+            return (self.stdX, self.stdY)
+        
+        return (max(int(round(self.stdX * self.scale)), 1) | 1,
+                max(int(round(self.stdY * self.scale)), 1) | 1)
+    
+    def edgeMask(self, imgIn):
+        """
+        Detect closed edges in input image.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+            
+        Returns
+        -------
+        imgEroded : numpy array
+            binary edge mask.
+
+        """
+        
+        ws = self.workspace
+        shape = imgIn.shape[:2]
+        
         # convert input image to grayscale
-        imgGray = cv2.cvtColor(imgIn,
-                               cv2.COLOR_BGR2GRAY)
+        imgGray = self.grayImg(imgIn)
         
         # blur grayscale image        
-        imgBlurred = cv2.GaussianBlur(imgGray, (self.stdX, self.stdY), 0)
+        imgBlurred = cv2.GaussianBlur(imgGray,
+                                      self.blurKernel(),
+                                      0,
+                                      dst = ws.buffer('blurred', shape))
         
         # detect edges in grayscale image
         imgCanny = cv2.Canny(imgBlurred,
-                           self.loThresh,
-                           self.hiThresh)
-        
-        # dilate and erode to close gaps
-        imgDilated = cv2.dilate(imgCanny, None, iterations=self.dilIter)
-        imgEroded = cv2.erode(imgDilated, None, iterations=self.eroIter)
+                             self.loThresh,
+                             self.hiThresh,
+                             edges = ws.buffer('edges', shape))
         
-        # find contours based on detected edges
-        contours, _ = cv2.findContours(imgEroded,
-                                         cv2.RETR_TREE,
-                                         cv2.CHAIN_APPROX_SIMPLE)
+        # dilate and erode to close gaps, eroding back into edge buffer
+        imgDilated = cv2.dilate(imgCanny,
+                                None,
+                                dst = ws.buffer('dilated', shape),
+                                iterations = self.dilIter)
+        imgEroded = cv2.erode(imgDilated,
+                              None,
+                              dst = imgCanny,
+                              iterations = self.eroIter)
     
-        return contours
+        return imgEroded
     
-    def extractCenters(self, contours):
+    def extractObjects(self, contours):
         """
-        Extract centers of object contours.
+        Extract object records of contours, i.e. bounding boxes, centroids,
+        areas and perimeters. All contours are processed at once by
+        reductions over their concatenated points.
 
         Parameters
         ----------
@@ -133,81 +336,144 @@ class ContourDetector(Detector):
             
         Returns
         -------
-        centers : list
-            object centers.
+        objs : numpy array
+            object records.
 
         """
         
-        centers = [None] * len(contours)
-        contoursPoly = [None] * len(contours)
-        boxes = [None] * len(contours)
+        objs = rec.newObjects(len(contours))
+        if len(contours) == 0:
+            return objs
+        
+        # concatenated points and first point of each contour
+        lengths = np.array([len(c) for c in contours])
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        points = np.concatenate(contours).reshape(-1, 2).astype(np.float64)
+        x = points[:, 0]
+        y = points[:, 1]
+        
+        # bounding boxes
+        xMin = np.minimum.reduceat(x, starts)
+        yMin = np.minimum.reduceat(y, starts)
+        objs['x'] = xMin
+        objs['y'] = yMin
+        objs['w'] = np.maximum.reduceat(x, starts) - xMin + 1
+        objs['h'] = np.maximum.reduceat(y, starts) - yMin + 1
         
-        for i in range(len(contours)):
+        # next point along each closed contour
+        iNext = np.arange(1, len(points) + 1)
+        iNext[starts + lengths - 1] = starts
+        xNext = x[iNext]
+        yNext = y[iNext]
+        
+        # signed areas and centroids from polygon moments
+        cross = x * yNext - xNext * y
+        area = np.add.reduceat(cross, starts) / 2
+        momX = np.add.reduceat((x + xNext) * cross, starts) / 6
+        momY = np.add.reduceat((y + yNext) * cross, starts) / 6
+        
+        # mean of points for contours without area
+        flat = area == 0
+        area[flat] = 1
+        objs['cx'] = np.where(flat, np.add.reduceat(x, starts) / lengths, momX / area)
+        objs['cy'] = np.where(flat, np.add.reduceat(y, starts) / lengths, momY / area)
+        objs['area'] = np.where(flat, 0, np.abs(area))
+        
+        # perimeters of closed contours
+        objs['perimeter'] = np.add.reduceat(np.hypot(xNext - x, yNext - y), starts)
             
-            # define bounding boxes around Contours
-            contoursPoly[i] = cv2.approxPolyDP(contours[i], 3, True)
-            boxes[i] = cv2.boundingRect(contoursPoly[i])
+        return objs
+    
+    def extractCenters(self, contours):
+        """
+        Extract centers of object contours.
+
+        Parameters
+        ----------
+        contours : list
+            object contours.
             
-            center = (boxes[i][0], boxes[i][1])
-            centers[i] = center
+        Returns
+        -------
+        centers : numpy array
+            object centers with shape (n, 2).
+
+        """
+        
+        objs = self.extractObjects(contours)
             
-        return centers
+        return np.stack((objs['x'], objs['y']), 1)
     
-    def saveParameters(self, outDir):
+    def detectObjects(self, imgIn):
         """
-        save used detection parameters
+        Detect uncolored and colored objects by contour extraction.
 
         Parameters
         ----------
-        outDir : string
-            path to output directory.
-            
+        imgIn : numpy array
+            input image.
+
         Returns
         -------
-        None.
+        objs : numpy array
+            object records.
 
         """
         
-        header = 'used detection parameters\n'
+        prof = self.profiler
         
-        # check, if output dir exists
-        if not os.path.isdir(outDir):
-            os.mkdir(outDir)
-        
-        # go to output dir
-        os.chdir(outDir)
-
-        # write parameters to file
-        parFile = open('para.dat', 'w')
-        
-        parFile.write(header)
-        line = 'meanRefH: ' + str(self.meanRefH) + '\n'
-        parFile.write(line)
-        line = 'stdRefH: ' + str(self.stdRefH) + '\n'
-        parFile.write(line)
-        line = 'factor: ' + str(self.factor) + '\n'
-        parFile.write(line)
-        line = 'stdX: ' + str(self.stdX) + '\n'
-        parFile.write(line)
-        line = 'stdY: ' + str(self.stdY) + '\n'
-        parFile.write(line)
-        line = 'loThresh: ' + str(self.loThresh) + '\n'
-        parFile.write(line)        
-        line = 'hiThresh: ' + str(self.hiThresh) + '\n'
-        parFile.write(line)
-        line = 'dilIter: ' + str(self.dilIter) + '\n'
-        parFile.write(line)
-        line = 'eroIter: ' + str(self.eroIter) + '\n'
-        parFile.write(line)
-        
-        parFile.close()
-        
-        # go back to working dir
-        os.chdir('..')   
-        
-    def detect(self, relInDir='data', relOutDir = 'results'):
+        # detect object contours
+        with prof.stage('extractContours'):
+            contours = self.extractContours(imgIn)
+        
+        # extract object records
+        with prof.stage('extractObjects'):
+            objs = self.extractObjects(contours)
+        
+        # get mean colors and select colored objects
+        with prof.stage('colorObjects'):
+            if self.scale != 1 and not self.refine:
+                # mean colors at detection scale
+                imgSmall = self.downscale(imgIn)
+                imgHSV = self.hsvImg(imgSmall)
+                meanH = self.meanContourH(imgHSV,
+                                          self.mapContours(contours,
+                                                           self.scale,
+                                                           imgSmall.shape))
+            else:
+                imgHSV = self.hsvImg(imgIn)
+                meanH = self.meanContourH(imgHSV, contours)
+            objs = self.colorObjects(objs, meanH)
+        
+        prof.count('contours', len(contours))
+        
+        return objs
+    
+    def parameters(self):
+        """
+        Get used detection parameters.
+
+        Returns
+        -------
+        params : list
+            (name, value) of each parameter.
+
+        """
+        
+        return Detector.parameters(self) + [('stdX', self.stdX),
+                                           ('stdY', self.stdY),
+                                           ('loThresh', self.loThresh),
+                                           ('hiThresh', self.hiThresh),
+                                           ('dilIter', self.dilIter),
+                                           ('eroIter', self.eroIter),
+                                           ('scale', self.scale),
+                                           ('refine', self.refine)]
+
+    def compareScale(self, relInDir = 'data', relOutDir = 'results', tol = None):
         """
-        Object detection routine using contour extraction.
+        Compare detection at detection scale with full resolution detection.
+        Objects are matched by centroids. Numbers of objects, matches,
+        centroid errors and times per image are written to accuracy.csv.
 
         Parameters
         ----------
@@ -215,52 +481,94 @@ class ContourDetector(Detector):
             relative input directory. The default is "data".
         relOutDir : string, optional
             relative output directory. The default is "results".
-            
+        tol : float, optional
+            maximum centroid distance of matched objects in x and y.
+            The default is None, i.e. half box size.
+
         Returns
         -------
-        None.
+        summary : dict
+            overall recall and precision of objects and colored objects,
+            mean centroid error and speedup.
 
         """
-
-        # results to save
-        self.results = []
+        
+        if tol is None:
+            tol = self.boxSize / 2
+        
+        # same detector at full resolution, with own timers and buffers
+        fullDetector = copy.copy(self)
+        fullDetector.scale = 1.
+        fullDetector.cache = None
+        fullDetector.profiler = Profiler(self.profiler.enabled)
+        fullDetector.workspace = Workspace()
         
         # absolute input and output directories
-        inDir = os.getcwd() + os.sep + relInDir
-        self.outDir = os.getcwd() + os.sep + relOutDir
-
-        # go through all images in input dir
-        for imgFile in os.listdir(inDir):
-            if imgFile.endswith('.jpg'):
+        inDir = os.path.abspath(relInDir)
+        outDir = os.path.abspath(relOutDir)
+        
+        # check, if output dir exists
+        if not os.path.isdir(outDir):
+            os.makedirs(outDir)
+        
+        imgFiles = fh.iterImgs(inDir, exclude = (outDir,))
+        
+        totals = np.zeros(8)
+        errors = []
+        
+        with open(os.path.join(outDir, 'accuracy.csv'), 'w') as accFile:
+            accFile.write('imgName nObjFull nObj nMatch nColObjFull nColObj ' +
+                          'nColMatch meanError timeFull time\n')
             
-                # read input image
+            for imgFile in imgFiles:
                 imgIn = fh.readImgIn(inDir, imgFile)
                 
-                # detect object contours
-                contours = self.extractContours(imgIn)
+                t0 = time.perf_counter()
+                full = fullDetector.findObjects(imgIn)
+                t1 = time.perf_counter()
+                objs = self.findObjects(imgIn)
+                t2 = time.perf_counter()
                 
-                # extract object centers
-                centers = self.extractCenters(contours)
+                # index of full resolution centroids
+                index = SpatialIndex(2 * tol, max(len(full), 64))
+                for cx, cy in zip(full['cx'].tolist(), full['cy'].tolist()):
+                    index.insert((cx, cy), 0)
                 
-                # select colored objects
-                uncObjCen, colObjCen = self.selectColObjCen(imgIn,
-                                                            contours,
-                                                            centers)
+                # match each object to one full resolution object
+                nMatch = 0
+                nColMatch = 0
+                imgErrors = []
+                for obj in objs:
+                    i = index.hit(obj['cx'], obj['cy'], 0)
+                    if i is None:
+                        continue
+                    
+                    # matched objects are moved out of the way
+                    index.move(i, 1)
+                    nMatch += 1
+                    nColMatch += obj['colored'] and full['colored'][i]
+                    imgErrors.append(np.hypot(obj['cx'] - index.xs[i],
+                                              obj['cy'] - index.ys[i]))
                 
-                # manually select additional objects
-                # or de-select existant ones
-                imgOut, uncObjCen, colObjCen = self.manuallySelectCenters(imgIn,
-                                                                      uncObjCen,
-                                                                      colObjCen)
+                errors += imgErrors
+                meanError = np.mean(imgErrors) if imgErrors else 0.
+                nColFull = int(np.count_nonzero(full['colored']))
+                nCol = int(np.count_nonzero(objs['colored']))
                 
-                fh.saveImgOut(self.outDir, imgFile, imgOut)
+                accFile.write(imgFile + ' ' + str(len(full)) + ' ' +
+                              str(len(objs)) + ' ' + str(nMatch) + ' ' +
+                              str(nColFull) + ' ' + str(nCol) + ' ' +
+                              str(int(nColMatch)) + ' ' + str(meanError) + ' ' +
+                              str(t1 - t0) + ' ' + str(t2 - t1) + '\n')
                 
-                # all object centers
-                centers = uncObjCen + colObjCen
-
-                # append results of image to list
-                self.results.append([imgFile, str(len(centers)), str(len(colObjCen))])
-
-        # save results and used parameters to files
-        fh.saveResults(self.outDir, self.results)
-        self.saveParameters(self.outDir)
+                totals += [len(full), len(objs), nMatch, nColFull, nCol,
+                           nColMatch, t1 - t0, t2 - t1]
+        
+        nFull, nObj, nMatch, nColFull, nCol, nColMatch, tFull, tScaled = totals
+        
+        return {'recall': float(nMatch / nFull) if nFull else 1.,
+                'precision': float(nMatch / nObj) if nObj else 1.,
+                'colRecall': float(nColMatch / nColFull) if nColFull else 1.,
+                'colPrecision': float(nColMatch / nCol) if nCol else 1.,
+                'meanError': float(np.mean(errors)) if errors else 0.,
+                'speedup': float(tFull / tScaled) if tScaled else None}
@@ -9,12 +9,160 @@ Created on Thu Aug  5 13:32:09 2021
 
 import os
 import sys
+import time
+import functools
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 
 import cv2
 
 import codpy.file_handling as fh
+import codpy.records as rec
 from codpy.selector import Selector
+from codpy.profiler import Profiler
+from codpy.tiling import iterTiles, ownObjects
+from codpy.workspace import Workspace
+from codpy.object_store import ObjectWriter
+
+
+# detector used by each worker process in parallel batch mode
+_workerDetector = None
+
+# stacks mapped by each worker process, by path and frame shape
+_workerStacks = {}
+
+
+def _initWorker(detector):
+    """
+    Initialize worker process for parallel batch detection.
+
+    Parameters
+    ----------
+    detector : Detector
+        detector to use in worker process.
+
+    Returns
+    -------
+    None.
+
+    """
+    
+    global _workerDetector
+    _workerDetector = detector
+    
+    _workerStacks.clear()
+    
+    # one OpenCV thread per process to avoid oversubscription
+    cv2.setNumThreads(1)
+
+
+def _detectImgWorker(inDir, outDir, imgFile):
+    """
+    Detect objects in a single image within a worker process.
+
+    Parameters
+    ----------
+    inDir : string
+        absolute input directory.
+    outDir : string
+        absolute output directory.
+    imgFile : string
+        input image filename.
+
+    Returns
+    -------
+    result : tuple
+        result of image.
+    objs : numpy array
+        object records of image.
+    stats : tuple or None
+        profiler stats of image.
+
+    """
+    
+    result, objs = _workerDetector.processImg(inDir, outDir, imgFile)
+    
+    return result, objs, _workerDetector.profiler.pop()
+
+
+def _mapOrdered(executor, fn, iterables, window):
+    """
+    Map function over iterables on executor, keeping order of results.
+    Unlike Executor.map, arguments are consumed lazily and at most window
+    calls are pending at a time.
+
+    Parameters
+    ----------
+    executor : Executor
+        executor to submit calls to.
+    fn : callable
+        function to call.
+    iterables : list
+        iterables of arguments, consumed in parallel.
+    window : int
+        maximum number of pending calls.
+
+    Yields
+    ------
+    result : object
+        result of each call, in order of arguments.
+
+    """
+    
+    pending = deque()
+    
+    for args in zip(*iterables):
+        pending.append(executor.submit(fn, *args))
+        
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    
+    while pending:
+        yield pending.popleft().result()
+
+
+def _detectFrameWorker(stackPath, frameShape, outDir, i, frameFile):
+    """
+    Detect objects in a single frame of a stack within a worker process.
+    Stack is mapped once per worker process, so frames are not sent to it.
+
+    Parameters
+    ----------
+    stackPath : string
+        path to stack file.
+    frameShape : tuple or None
+        frame height and width of raw stack file.
+    outDir : string
+        absolute output directory.
+    i : int
+        frame number.
+    frameFile : string
+        frame name.
+
+    Returns
+    -------
+    result : tuple
+        result of frame.
+    objs : numpy array
+        object records of frame.
+    stats : tuple or None
+        profiler stats of frame.
+
+    """
+    
+    key = (stackPath, None if frameShape is None else tuple(frameShape))
+    if key not in _workerStacks:
+        _workerStacks[key] = fh.openStack(stackPath, frameShape)
+    stack = _workerStacks[key]
+    
+    result, objs = _workerDetector.processImg(os.path.dirname(stackPath),
+                                              outDir,
+                                              frameFile,
+                                              imgIn = stack[i])
+    
+    return result, objs, _workerDetector.profiler.pop()
 
 
 class Detector(Selector):
@@ -29,7 +177,10 @@ class Detector(Selector):
                  stdRefH = 10,
                  factor = 1.,
                  boxSize = 10,
-                 lineWidth = 2):
+                 lineWidth = 2,
+                 profile = None,
+                 tileSize = None,
+                 tileOverlap = 64):
         """
         Constructor.
 
@@ -45,6 +196,18 @@ class Detector(Selector):
             side length of bounding boxes. The default is 10.
         lineWidth : int, optional
             line width of bounding boxes. The default is 2.
+        profile : bool or string, optional
+            True to time pipeline stages, "cprofile" to also capture a
+            cProfile. The default is None, i.e. read from environment
+            variable CODPY_PROFILE.
+        tileSize : int, optional
+            side length of tiles to detect objects in separately, bounding
+            memory of detection by tile size. The default is None, i.e.
+            detect in whole image.
+        tileOverlap : int, optional
+            overlap of neighbouring tiles. Has to exceed object size, so
+            that each object lies within one tile completely.
+            The default is 64.
         
         Returns
         -------
@@ -59,6 +222,40 @@ class Detector(Selector):
         self.meanRefH = meanRefH
         self.stdRefH = stdRefH
         self.factor = factor
+        
+        # optional stage timers and counters
+        self.profiler = Profiler.fromSetting(profile)
+        
+        # optional tiled detection
+        self.tileSize = tileSize
+        self.tileOverlap = tileOverlap
+        
+        # scratch buffers reused across images
+        self.workspace = Workspace()
+        
+        # background writer of output images
+        self.imgWriter = None
+        
+        # optional writer of object table
+        self.objWriter = None
+
+    def __getstate__(self):
+        """
+        Get state for pickling, e.g. to send detector to worker processes.
+        Open writers are not passed on.
+
+        Returns
+        -------
+        state : dict
+            object variables.
+
+        """
+        
+        state = Selector.__getstate__(self)
+        state['imgWriter'] = None
+        state['objWriter'] = None
+        
+        return state
 
     def escape(self):
         """
@@ -73,13 +270,68 @@ class Detector(Selector):
         # close remaining windows
         cv2.destroyAllWindows()
         
-        # save results and used parameters to files
-        fh.saveResults(self.outDir, self.results)
+        # finish pending output images, close object table and
+        # results file and save used parameters
+        self.closeImgWriter()
+        self.closeObjWriter()
+        self.closeResults()
         self.saveParameters(self.outDir)
         
+        # save profile until here
+        self.profiler.stop()
+        self.profiler.save(self.outDir)
+        
         # exit process
         sys.exit("Manually exited script.")
         
+    def closeImgWriter(self):
+        """
+        Wait for pending output images and close image writer, if opened.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        if self.imgWriter is not None:
+            imgWriter = self.imgWriter
+            self.imgWriter = None
+            imgWriter.close()
+
+    def closeObjWriter(self):
+        """
+        Write pending object records and close object table, if opened.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        if self.objWriter is not None:
+            self.objWriter.close()
+            self.objWriter = None
+
+    def writeResult(self, inDir, result):
+        """
+        Write result of image together with stamp of input image.
+
+        Parameters
+        ----------
+        inDir : string
+            absolute input directory.
+        result : tuple
+            image filename, number of objects and number of colored objects.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        self.resWriter.write(result, fh.imgStamp(inDir, result[0]))
+        
     def selectColObjCen(self,
                          imgIn,
                          contours,                            
@@ -94,7 +346,7 @@ class Detector(Selector):
             input image.
         contours : list
             object contours.
-        centers : list
+        centers : array like
             object centers.
             
         Returns
@@ -106,39 +358,248 @@ class Detector(Selector):
 
         """
         
-        # convert input image to grayscale
-        imgGray = cv2.cvtColor(imgIn,
-                               cv2.COLOR_BGR2GRAY)   
-        
         # convert input image to HSV scale
-        imgHSV = cv2.cvtColor(imgIn,
-                              cv2.COLOR_BGR2HSV)
+        imgHSV = self.hsvImg(imgIn)
         
-        # lists of centers of uncolored and colored objects
-        uncObjCen = centers.copy()
-        colObjCen = []
-                
-        # iterate over all object centers
-        for i in range(len(centers)):
-            # initialize and fill grayscale contour mask
-            mask = np.zeros(imgGray.shape, np.uint8)
-            cv2.drawContours(mask, contours[i], 0, 255, -1)
-            
-            # get mean HSV colors and mean H value for each object
-            meanColor = cv2.mean(imgHSV, mask = mask)
-            meanH = meanColor[0]
-
-            # select colored ojects according to reference mean H value
-            if ((meanH >= (self.meanRefH - self.factor * self.stdRefH)) and
-                (meanH <= (self.meanRefH + self.factor * self.stdRefH))):
-                colObjCen.append(centers[i])
-        
-        # delete colored objects from uncolored ones        
-        for x in colObjCen:
-            uncObjCen.remove(x)
+        # get mean H value for each object in a single pass
+        meanH = self.meanContourH(imgHSV, contours)
+        
+        # select colored ojects according to reference mean H value
+        isCol = self.isColObj(meanH)
+        
+        # split centers into uncolored and colored ones
+        centers = np.asarray(centers).reshape(-1, 2)
+        uncObjCen = [tuple(c) for c in centers[~isCol].tolist()]
+        colObjCen = [tuple(c) for c in centers[isCol].tolist()]
             
         return uncObjCen, colObjCen
 
+    def hsvImg(self, imgIn):
+        """
+        Convert input image to HSV scale in a reused buffer.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+
+        Returns
+        -------
+        imgHSV : numpy array
+            input image in HSV scale, valid until next conversion.
+
+        """
+        
+        return cv2.cvtColor(imgIn,
+                            cv2.COLOR_BGR2HSV,
+                            dst = self.workspace.buffer('hsv', imgIn.shape))
+
+    def grayImg(self, imgIn):
+        """
+        Convert input image to grayscale in a reused buffer.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+
+        Returns
+        -------
+        imgGray : numpy array
+            input image in grayscale, valid until next conversion.
+
+        """
+        
+        return cv2.cvtColor(imgIn,
+                            cv2.COLOR_BGR2GRAY,
+                            dst = self.workspace.buffer('gray', imgIn.shape[:2]))
+
+    def meanContourH(self, imgHSV, contours):
+        """
+        Get mean H color value inside each filled contour.
+        All contours are rasterized into a single label image. Each pixel
+        carries the label of the innermost contour enclosing it, so that H
+        sums of all contours are obtained by one bincount reduction. Sums of
+        nested contours are accumulated into their enclosing contours
+        afterwards, which gives the mean over each filled contour.
+
+        Parameters
+        ----------
+        imgHSV : numpy array
+            input image in HSV scale.
+        contours : list
+            object contours.
+
+        Returns
+        -------
+        meanH : numpy array
+            mean H value of each contour.
+
+        """
+        
+        nCon = len(contours)
+        if nCon == 0:
+            return np.zeros(0)
+        
+        # draw larger contours first, so nested ones overwrite them
+        areas = np.array([cv2.contourArea(c) for c in contours])
+        order = np.argsort(-areas, kind='stable')
+        
+        # label image, 0 is background and i+1 is contour i
+        labels = self.workspace.buffer('labels', imgHSV.shape[:2], np.int32)
+        labels.fill(0)
+        parents = np.zeros(nCon + 1, np.intp)
+        
+        for i in order:
+            # enclosing contour is the one drawn below the first point
+            x, y = contours[i][0, 0]
+            parents[i + 1] = labels[y, x]
+            cv2.drawContours(labels, [contours[i]], 0, int(i + 1), -1)
+        
+        # H sums and pixel counts of all labels in one pass
+        sums, counts = self.labelSumsH(imgHSV, labels, nCon + 1)
+        
+        # accumulate nested contours into enclosing ones, innermost first
+        for i in order[::-1]:
+            sums[parents[i + 1]] += sums[i + 1]
+            counts[parents[i + 1]] += counts[i + 1]
+        
+        return sums[1:] / np.maximum(counts[1:], 1)
+
+    def labelSumsH(self, imgHSV, labels, nLabels):
+        """
+        Get sums of H color values and pixel counts of all labels in a
+        label image by a single bincount reduction.
+
+        Parameters
+        ----------
+        imgHSV : numpy array
+            input image in HSV scale.
+        labels : numpy array
+            label image.
+        nLabels : int
+            number of labels including background label 0.
+
+        Returns
+        -------
+        sums : numpy array
+            sum of H values of each label.
+        counts : numpy array
+            number of pixels of each label.
+
+        """
+        
+        labels = labels.ravel()
+        sums = np.bincount(labels,
+                           weights = imgHSV[:, :, 0].ravel(),
+                           minlength = nLabels)
+        counts = np.bincount(labels, minlength = nLabels).astype(np.float64)
+        
+        return sums, counts
+
+    def meanLabelH(self, imgHSV, labels, nLabels):
+        """
+        Get mean H color value of all labels in a label image.
+
+        Parameters
+        ----------
+        imgHSV : numpy array
+            input image in HSV scale.
+        labels : numpy array
+            label image.
+        nLabels : int
+            number of labels including background label 0.
+
+        Returns
+        -------
+        meanH : numpy array
+            mean H value of labels 1 to nLabels-1.
+
+        """
+        
+        sums, counts = self.labelSumsH(imgHSV, labels, nLabels)
+        
+        return sums[1:] / np.maximum(counts[1:], 1)
+
+    def isColObj(self, meanH):
+        """
+        Check, which objects are colored according to reference H value.
+
+        Parameters
+        ----------
+        meanH : numpy array
+            mean H value of each object.
+
+        Returns
+        -------
+        isCol : numpy array
+            True for colored objects.
+
+        """
+        
+        meanH = np.asarray(meanH)
+        
+        return ((meanH >= (self.meanRefH - self.factor * self.stdRefH)) &
+                (meanH <= (self.meanRefH + self.factor * self.stdRefH)))
+
+    def countColObj(self, meanH, meanRefH, stdRefH, factor):
+        """
+        Count colored objects for a grid of color parameters at once.
+        All combinations of given reference H means, standard deviations and
+        limit factors are evaluated by broadcasting against the sorted mean
+        H values of the objects.
+
+        Parameters
+        ----------
+        meanH : numpy array
+            mean H value of each object.
+        meanRefH : array like
+            means of reference H color value.
+        stdRefH : array like
+            standard deviations of reference H color value.
+        factor : array like
+            color limit factors.
+
+        Returns
+        -------
+        nColObj : numpy array
+            number of colored objects with shape
+            (len(meanRefH), len(stdRefH), len(factor)).
+
+        """
+        
+        meanH = np.sort(np.asarray(meanH, np.float64))
+        
+        # broadcast parameters onto grid
+        meanRefH = np.asarray(meanRefH, np.float64)[:, None, None]
+        stdRefH = np.asarray(stdRefH, np.float64)[None, :, None]
+        factor = np.asarray(factor, np.float64)[None, None, :]
+        
+        # color limits as in isColObj
+        loH = meanRefH - factor * stdRefH
+        hiH = meanRefH + factor * stdRefH
+        
+        # objects within closed interval [loH, hiH]
+        return (np.searchsorted(meanH, hiH, side = 'right') -
+                np.searchsorted(meanH, loH, side = 'left'))
+
+    def parameters(self):
+        """
+        Get used detection parameters. Inheriting detectors add their own.
+
+        Returns
+        -------
+        params : list
+            (name, value) of each parameter.
+
+        """
+        
+        return [('meanRefH', self.meanRefH),
+                ('stdRefH', self.stdRefH),
+                ('factor', self.factor),
+                ('tileSize', self.tileSize),
+                ('tileOverlap', self.tileOverlap)]
+
     def saveParameters(self, outDir):
         """
         save used detection parameters
@@ -157,24 +618,857 @@ class Detector(Selector):
         header = 'used detection parameters\n'
         
         # check, if output dir exists
-        if not os.path.isdir(outDir):
-            os.mkdir(outDir)
+        os.makedirs(outDir, exist_ok = True)
+        
+        lines = [header]
+        for name, value in self.parameters():
+            lines.append(name + ': ' + str(value) + '\n')
         
-        # go to output dir
-        os.chdir(outDir)
-
         # write parameters to file
-        parFile = open('para.dat', 'w')
+        fh.writeAtomic(os.path.join(outDir, 'para.dat'), lines)
+
+    def colorObjects(self, objs, meanH):
+        """
+        Set mean H values of objects and select colored ones according to
+        reference H value.
+
+        Parameters
+        ----------
+        objs : numpy array
+            object records.
+        meanH : numpy array
+            mean H value of each object.
+
+        Returns
+        -------
+        objs : numpy array
+            object records with colors.
+
+        """
         
-        parFile.write(header)
-        line = 'meanRefH: ' + str(self.meanRefH) + '\n'
-        parFile.write(line)
-        line = 'stdRefH: ' + str(self.stdRefH) + '\n'
-        parFile.write(line)
-        line = 'factor: ' + str(self.factor) + '\n'
-        parFile.write(line)
+        objs['meanH'] = meanH
+        objs['colored'] = self.isColObj(meanH)
+        
+        return objs
+
+    def detectObjects(self, imgIn):
+        """
+        Detect uncolored and colored objects.
+        Has to be specified by inheriting detectors.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+
+        Returns
+        -------
+        objs : numpy array
+            object records.
+
+        """
         
-        parFile.close()
+        raise NotImplementedError("detectObjects has to be specified.")
+
+    def findObjects(self, imgIn):
+        """
+        Detect uncolored and colored objects in whole image or tile by tile,
+        if tiling is enabled.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+
+        Returns
+        -------
+        objs : numpy array
+            object records.
+
+        """
+        
+        if self.tileSize is None:
+            return self.detectObjects(imgIn)
+        
+        return self.detectTiles(imgIn)
+
+    def detectTiles(self, imgIn):
+        """
+        Detect uncolored and colored objects in overlapping tiles. Each tile
+        is copied from input image, which may be a memory map, and processed
+        on its own, so that detection buffers are bounded by tile size.
+        Objects are kept by the tile, whose core contains their centroid.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+
+        Returns
+        -------
+        objs : numpy array
+            object records in image coordinates.
+
+        """
+        
+        height, width = imgIn.shape[:2]
+        
+        tileObjs = [self.detectTile(imgIn, tile, core)
+                    for tile, core in iterTiles(height,
+                                                width,
+                                                self.tileSize,
+                                                self.tileOverlap)]
+        
+        if not tileObjs:
+            return rec.newObjects()
+        
+        return np.concatenate(tileObjs)
+
+    def detectTile(self, imgIn, tile, core):
+        """
+        Detect uncolored and colored objects in a single tile.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+        tile : tuple
+            tile extent (x0, y0, x1, y1).
+        core : tuple
+            tile core (x0, y0, x1, y1).
+
+        Returns
+        -------
+        objs : numpy array
+            object records owned by tile in image coordinates.
+
+        """
+        
+        x0, y0, x1, y1 = tile
+        
+        # contiguous copy of tile only
+        imgTile = self.workspace.buffer('tile',
+                                        (y1 - y0, x1 - x0) + imgIn.shape[2:],
+                                        imgIn.dtype)
+        imgTile[...] = imgIn[y0:y1, x0:x1]
+        
+        self.profiler.count('tiles')
+        
+        # detect in tile and keep objects owned by tile
+        return ownObjects(self.detectObjects(imgTile), tile, core)
+
+    def detectChanges(self,
+                      frame,
+                      regionRefs,
+                      regionObjs,
+                      regionSize = 256,
+                      diffThresh = 0):
+        """
+        Detect uncolored and colored objects in overlapping regions of a
+        frame, which changed since they were last detected. Unchanged regions
+        reuse their objects. Each region is compared to its own reference,
+        i.e. its pixels at its last detection, so that gradual changes add
+        up until the region is detected again. Regions are tiles with
+        overlap tileOverlap.
+
+        Parameters
+        ----------
+        frame : numpy array
+            current frame.
+        regionRefs : list or None
+            pixels of each region at its last detection.
+        regionObjs : list or None
+            object records of each region at its last detection.
+        regionSize : int, optional
+            side length of region cores. The default is 256.
+        diffThresh : int, optional
+            maximum absolute pixel difference of unchanged regions.
+            The default is 0.
+
+        Returns
+        -------
+        objs : numpy array
+            object records of frame.
+        regionRefs : list
+            pixels of each region at its last detection.
+        regionObjs : list
+            object records of each region at its last detection.
+        nReused : int
+            number of unchanged regions.
+
+        """
+        
+        height, width = frame.shape[:2]
+        
+        regions = list(iterTiles(height, width, regionSize, self.tileOverlap))
+        
+        # regions of frames of other size are not comparable
+        if regionRefs is None or len(regionRefs) != len(regions):
+            regionRefs = [None] * len(regions)
+            regionObjs = [None] * len(regions)
+        else:
+            regionRefs = list(regionRefs)
+            regionObjs = list(regionObjs)
+        
+        nReused = 0
+        
+        for k, (tile, core) in enumerate(regions):
+            x0, y0, x1, y1 = tile
+            
+            if (regionRefs[k] is not None and
+                    regionRefs[k].shape == frame[y0:y1, x0:x1].shape):
+                # pixel differences to reference of region
+                diff = cv2.absdiff(frame[y0:y1, x0:x1],
+                                   regionRefs[k],
+                                   dst = self.workspace.buffer('diff',
+                                                               regionRefs[k].shape))
+                
+                if diff.max() <= diffThresh:
+                    # unchanged region keeps its objects and reference
+                    nReused += 1
+                    continue
+            
+            regionRefs[k] = frame[y0:y1, x0:x1].copy()
+            regionObjs[k] = self.detectTile(frame, tile, core)
+        
+        if not regionObjs:
+            return rec.newObjects(), regionRefs, regionObjs, nReused
+        
+        return np.concatenate(regionObjs), regionRefs, regionObjs, nReused
+
+    def detectImg(self,
+                  inDir,
+                  outDir,
+                  imgFile,
+                  interactive = False,
+                  imgIn = None):
+        """
+        Detect objects in a single image and save marked output image.
+        If an object table is opened, object records are added to it.
+
+        Parameters
+        ----------
+        inDir : string
+            absolute input directory.
+        outDir : string
+            absolute output directory.
+        imgFile : string
+            input image filename.
+        interactive : bool, optional
+            manually (de-) select objects after detection. The default is False.
+        imgIn : numpy array, optional
+            input image, if already read. The default is None.
+
+        Returns
+        -------
+        result : tuple
+            image filename, number of objects and number of colored objects.
+
+        """
+        
+        result, objs = self.processImg(inDir,
+                                       outDir,
+                                       imgFile,
+                                       interactive,
+                                       imgIn)
+        
+        if self.objWriter is not None:
+            self.objWriter.write(imgFile, objs)
+        
+        return result
+
+    def processImg(self,
+                   inDir,
+                   outDir,
+                   imgFile,
+                   interactive = False,
+                   imgIn = None):
+        """
+        Detect objects in a single image and save marked output image.
+        If an image writer is opened, the output image is saved in
+        background and its result is written, once it is saved.
+
+        Parameters
+        ----------
+        inDir : string
+            absolute input directory.
+        outDir : string
+            absolute output directory.
+        imgFile : string
+            input image filename.
+        interactive : bool, optional
+            manually (de-) select objects after detection. The default is False.
+        imgIn : numpy array, optional
+            input image, if already read. The default is None.
+
+        Returns
+        -------
+        result : tuple
+            image filename, number of objects and number of colored objects.
+        objs : numpy array
+            object records of image.
+
+        """
+        
+        prof = self.profiler
+        
+        # read input image
+        if imgIn is None:
+            with prof.stage('readImgIn'):
+                imgIn = fh.readImgIn(inDir, imgFile)
+        
+        # detect uncolored and colored objects
+        with prof.stage('detectObjects'):
+            objs = self.findObjects(imgIn)
+        
+        uncObjCen, colObjCen = rec.objCenters(objs)
+        
+        if interactive:
+            # manually select additional objects
+            # or de-select existant ones
+            with prof.stage('manuallySelectCenters'):
+                imgOut, uncObjCen, colObjCen = self.manuallySelectCenters(imgIn,
+                                                                      uncObjCen,
+                                                                      colObjCen)
+            objs = rec.updateObjects(objs, uncObjCen, colObjCen)
+        else:
+            # only mark detected objects
+            with prof.stage('markCenters'):
+                imgOut = self.markCenters(imgIn, uncObjCen, colObjCen)
+        
+        # numbers of all and colored objects
+        nObj = len(objs)
+        nColObj = int(np.count_nonzero(objs['colored']))
+        result = (imgFile, nObj, nColObj)
+        
+        with prof.stage('saveImgOut'):
+            if self.imgWriter is not None:
+                self.imgWriter.write(outDir, imgFile, imgOut, result)
+            else:
+                fh.saveImgOut(outDir, imgFile, imgOut)
+        
+        prof.count('images')
+        prof.count('pixels', imgIn.shape[0] * imgIn.shape[1])
+        prof.count('objects', nObj)
+        prof.count('colObjects', nColObj)
+        
+        return result, objs
+
+    def detect(self,
+               relInDir = 'data',
+               relOutDir = 'results',
+               interactive = True,
+               workers = 1,
+               resume = False,
+               prefetch = 2,
+               patterns = None,
+               recursive = False,
+               objects = None):
+        """
+        Object detection routine.
+
+        Parameters
+        ----------
+        relInDir : string, optional
+            relative input directory. The default is "data".
+        relOutDir : string, optional
+            relative output directory. The default is "results".
+        interactive : bool, optional
+            manually (de-) select objects after detection. The default is True.
+        workers : int, optional
+            number of worker processes in non-interactive batch mode.
+            The default is 1.
+        resume : bool, optional
+            skip unchanged images processed in a previous run.
+            The default is False.
+        prefetch : int, optional
+            number of input images to read ahead and output images to save
+            in background, when detecting in this process. The default is 2.
+            0 reads and saves synchronously. With tiles, at most 1.
+        patterns : list, optional
+            glob patterns of image paths to detect in. The default is None,
+            i.e. all images.
+        recursive : bool, optional
+            include images in subdirectories. The default is False.
+        objects : string, optional
+            format of table of all object records, "npy" or "parquet",
+            written to objects/ in output directory. The default is None,
+            i.e. no object table.
+            
+        Returns
+        -------
+        None.
+
+        """
+        
+        if interactive and workers > 1:
+            raise ValueError("Parallel detection requires interactive=False.")
+
+        # absolute input and output directories
+        inDir = os.path.abspath(relInDir)
+        self.outDir = os.path.abspath(relOutDir)
+        
+        # images in input dir, enumerated lazily in sorted order
+        imgFiles = fh.iterImgs(inDir,
+                               patterns,
+                               recursive,
+                               exclude = (self.outDir,))
+        
+        # object records are written to table in parts
+        recorded = None
+        if objects is not None:
+            self.objWriter = ObjectWriter(self.outDir,
+                                          append = resume,
+                                          fileFormat = objects)
+            recorded = self.objWriter.imgFiles()
+        
+        # results are written to file image by image
+        imgFiles = self.openResults(inDir, imgFiles, resume, recorded)
+        
+        # full images are read ahead and saved in background, so that
+        # tiles bound detection buffers only
+        if self.tileSize is not None:
+            prefetch = min(prefetch, 1)
+        
+        self.profiler.start()
+        
+        if workers > 1:
+            # fan images out to worker processes, keeping their order
+            with ProcessPoolExecutor(max_workers = workers,
+                                     initializer = _initWorker,
+                                     initargs = (self,)) as executor:
+                for result, objs, stats in _mapOrdered(executor,
+                                                       _detectImgWorker,
+                                                       [itertools.repeat(inDir),
+                                                        itertools.repeat(self.outDir),
+                                                        imgFiles],
+                                                       4 * workers):
+                    if self.objWriter is not None:
+                        self.objWriter.write(result[0], objs)
+                    self.writeResult(inDir, result)
+                    
+                    # aggregate stage timers of workers
+                    self.profiler.merge(stats)
+        elif prefetch > 0:
+            # read ahead and save in background, results are written
+            # once their output image is saved
+            self.imgWriter = fh.AsyncWriter(prefetch,
+                                            onSaved = functools.partial(
+                                                self.writeResult, inDir))
+            try:
+                for imgFile, imgIn in fh.prefetchImgs(inDir, imgFiles, prefetch):
+                    self.detectImg(inDir,
+                                   self.outDir,
+                                   imgFile,
+                                   interactive,
+                                   imgIn)
+            finally:
+                self.closeImgWriter()
+        else:
+            # go through all images to process
+            for imgFile in imgFiles:
+                result = self.detectImg(inDir,
+                                        self.outDir,
+                                        imgFile,
+                                        interactive)
+                self.writeResult(inDir, result)
+        
+        self.profiler.stop()
+
+        # close object table and results file and save used parameters
+        # and profile
+        self.closeObjWriter()
+        self.closeResults()
+        self.saveParameters(self.outDir)
+        self.profiler.save(self.outDir)
+
+    def detectStack(self,
+                    stackPath,
+                    relOutDir = 'results',
+                    frameShape = None,
+                    interactive = False,
+                    workers = 1,
+                    objects = None):
+        """
+        Object detection routine for a memory mapped stack of frames.
+        Frames are passed to detection as views into the mapped file,
+        without per-frame decoding or copies. Marked frames are saved as
+        .png images in a subdirectory named after the stack.
+
+        Parameters
+        ----------
+        stackPath : string
+            relative or absolute path to .npy or raw stack file of shape
+            (N, H, W, 3), BGR uint8.
+        relOutDir : string, optional
+            relative output directory. The default is "results".
+        frameShape : tuple, optional
+            frame height and width of raw stack file. The default is None,
+            i.e. .npy file.
+        interactive : bool, optional
+            manually (de-) select objects after detection. The default is False.
+        workers : int, optional
+            number of worker processes in non-interactive mode.
+            The default is 1.
+        objects : string, optional
+            format of table of all object records, "npy" or "parquet".
+            The default is None, i.e. no object table.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        if interactive and workers > 1:
+            raise ValueError("Parallel detection requires interactive=False.")
+        
+        stackPath = os.path.abspath(stackPath)
+        self.outDir = os.path.abspath(relOutDir)
+        
+        stack = fh.openStack(stackPath, frameShape)
+        frameFiles = fh.frameFiles(stackPath, len(stack))
+        
+        # frames are no files to stamp, so runs are not resumed
+        if objects is not None:
+            self.objWriter = ObjectWriter(self.outDir, fileFormat = objects)
+        self.openResults(os.path.dirname(stackPath), frameFiles)
+        
+        self.profiler.start()
+        
+        if workers > 1:
+            # workers map the stack themselves
+            with ProcessPoolExecutor(max_workers = workers,
+                                     initializer = _initWorker,
+                                     initargs = (self,)) as executor:
+                for result, objs, stats in _mapOrdered(executor,
+                                                       _detectFrameWorker,
+                                                       [itertools.repeat(stackPath),
+                                                        itertools.repeat(frameShape),
+                                                        itertools.repeat(self.outDir),
+                                                        range(len(stack)),
+                                                        frameFiles],
+                                                       4 * workers):
+                    if self.objWriter is not None:
+                        self.objWriter.write(result[0], objs)
+                    self.resWriter.write(result)
+                    
+                    # aggregate stage timers of workers
+                    self.profiler.merge(stats)
+        else:
+            # save marked frames in background
+            self.imgWriter = fh.AsyncWriter(onSaved = self.resWriter.write)
+            try:
+                for i, frameFile in enumerate(frameFiles):
+                    self.detectImg(os.path.dirname(stackPath),
+                                   self.outDir,
+                                   frameFile,
+                                   interactive,
+                                   stack[i])
+            finally:
+                self.closeImgWriter()
+        
+        self.profiler.stop()
+        
+        # close object table and results file and save used parameters
+        # and profile
+        self.closeObjWriter()
+        self.closeResults()
+        self.saveParameters(self.outDir)
+        self.profiler.save(self.outDir)
+
+    def streamObjects(self, frames, regionSize = 256, diffThresh = None):
+        """
+        Detect objects in a stream of frames, one frame at a time. If a
+        difference threshold is given, only regions changed since their
+        last detection are detected again.
+
+        Parameters
+        ----------
+        frames : iterable
+            BGR frames.
+        regionSize : int, optional
+            side length of regions for change detection. The default is 256.
+        diffThresh : int, optional
+            maximum absolute pixel difference of unchanged regions.
+            The default is None, i.e. detect in whole frames.
+
+        Yields
+        ------
+        frame : numpy array
+            current frame.
+        objs : numpy array
+            object records of frame.
+        nReused : int
+            number of unchanged regions.
+        nRegions : int
+            number of regions.
+
+        """
+        
+        prof = self.profiler
+        
+        regionRefs = None
+        regionObjs = None
+        
+        for frame in frames:
+            with prof.stage('detectObjects'):
+                if diffThresh is None:
+                    objs = self.findObjects(frame)
+                    nReused = 0
+                    nRegions = 1
+                else:
+                    (objs,
+                     regionRefs,
+                     regionObjs,
+                     nReused) = self.detectChanges(frame,
+                                                   regionRefs,
+                                                   regionObjs,
+                                                   regionSize,
+                                                   diffThresh)
+                    nRegions = len(regionObjs)
+            
+            prof.count('frames')
+            prof.count('reusedRegions', nReused)
+            
+            yield frame, objs, nReused, nRegions
+
+    def detectVideo(self,
+                    source,
+                    relOutDir = 'results',
+                    regionSize = 256,
+                    diffThresh = None,
+                    maxFrames = None,
+                    saveVideo = True,
+                    objects = None):
+        """
+        Object detection routine for a video file or camera stream.
+        Frames are read and processed one at a time. Numbers of objects
+        and colored objects per frame are written to results.csv and
+        marked frames to an output video. Throughput is written to
+        throughput.dat.
+
+        Parameters
+        ----------
+        source : string or int
+            relative or absolute path to video file or index of camera.
+        relOutDir : string, optional
+            relative output directory. The default is "results".
+        regionSize : int, optional
+            side length of regions for change detection. The default is 256.
+        diffThresh : int, optional
+            maximum absolute pixel difference of regions to reuse objects
+            of their last detection. The default is None, i.e. detect in whole
+            frames.
+        maxFrames : int, optional
+            maximum number of frames, e.g. of cameras. The default is None,
+            i.e. all frames.
+        saveVideo : bool, optional
+            write marked frames to output video. The default is True.
+        objects : string, optional
+            format of table of all object records, "npy" or "parquet".
+            The default is None, i.e. no object table.
+
+        Returns
+        -------
+        summary : dict
+            numbers of frames and objects, run time, frames per second and
+            fraction of reused regions.
+
+        """
+        
+        prof = self.profiler
+        
+        self.outDir = os.path.abspath(relOutDir)
+        
+        if isinstance(source, int):
+            name = 'camera' + str(source)
+        else:
+            name = os.path.splitext(os.path.basename(source))[0]
+        
+        capture = fh.openVideo(source)
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.
+        
+        # results and object records are written frame by frame
+        self.resWriter = fh.ResultsWriter(self.outDir)
+        if objects is not None:
+            self.objWriter = ObjectWriter(self.outDir, fileFormat = objects)
+        
+        videoWriter = None
+        nFrames = nObj = nReused = nRegions = 0
+        
+        self.profiler.start()
+        t0 = time.perf_counter()
+        
+        try:
+            for frame, objs, reused, regions in self.streamObjects(
+                    fh.iterFrames(capture, maxFrames),
+                    regionSize,
+                    diffThresh):
+                
+                frameName = name + '/' + str(nFrames).zfill(6)
+                uncObjCen, colObjCen = rec.objCenters(objs)
+                
+                if saveVideo:
+                    with prof.stage('markCenters'):
+                        imgOut = self.markCenters(frame, uncObjCen, colObjCen)
+                    
+                    # open output video at size of first frame
+                    if videoWriter is None:
+                        videoWriter = cv2.VideoWriter(
+                            fh.imgOutPath(self.outDir, name + '.mp4'),
+                            cv2.VideoWriter_fourcc(*'mp4v'),
+                            fps,
+                            (frame.shape[1], frame.shape[0]))
+                    
+                    with prof.stage('writeFrame'):
+                        videoWriter.write(imgOut)
+                
+                if self.objWriter is not None:
+                    self.objWriter.write(frameName, objs)
+                self.resWriter.write((frameName, len(objs), len(colObjCen)))
+                
+                nFrames += 1
+                nObj += len(objs)
+                nReused += reused
+                nRegions += regions
+        finally:
+            # keep output of interrupted streams
+            elapsed = time.perf_counter() - t0
+            self.profiler.stop()
+            
+            if videoWriter is not None:
+                videoWriter.release()
+            
+            self.closeObjWriter()
+            self.closeResults()
+        
+        summary = {'frames': nFrames,
+                   'objects': nObj,
+                   'seconds': elapsed,
+                   'fps': nFrames / elapsed if elapsed > 0 else 0.,
+                   'reusedRegions': nReused / nRegions if nRegions > 0 else 0.}
+        
+        fh.writeAtomic(os.path.join(self.outDir, 'throughput.dat'),
+                       [key + ': ' + str(value) + '\n'
+                        for key, value in summary.items()])
+        
+        self.saveParameters(self.outDir)
+        self.profiler.save(self.outDir)
+        
+        return summary
+
+    def detectMeanH(self, imgIn):
+        """
+        Detect objects and get their mean H color value.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+
+        Returns
+        -------
+        meanH : numpy array
+            mean H value of each object.
+
+        """
+        
+        return self.findObjects(imgIn)['meanH']
+
+    def sweep(self,
+              meanRefH,
+              stdRefH,
+              factor,
+              relInDir = 'data',
+              relOutDir = 'results',
+              patterns = None,
+              recursive = False):
+        """
+        Sweep over a grid of color parameters. Objects and their mean H
+        values are detected once per image, then all parameter combinations
+        are evaluated at once. Numbers of objects and colored objects per
+        image and parameter combination are written to sweep.csv.
+
+        Parameters
+        ----------
+        meanRefH : array like
+            means of reference H color value.
+        stdRefH : array like
+            standard deviations of reference H color value.
+        factor : array like
+            color limit factors.
+        relInDir : string, optional
+            relative input directory. The default is "data".
+        relOutDir : string, optional
+            relative output directory. The default is "results".
+        patterns : list, optional
+            glob patterns of image paths to sweep over. The default is None,
+            i.e. all images.
+        recursive : bool, optional
+            include images in subdirectories. The default is False.
+
+        Returns
+        -------
+        imgFiles : list
+            input image filenames.
+        nObj : numpy array
+            number of objects per image.
+        nColObj : numpy array
+            number of colored objects with shape
+            (len(imgFiles), len(meanRefH), len(stdRefH), len(factor)).
+
+        """
+        
+        meanRefH = np.atleast_1d(meanRefH)
+        stdRefH = np.atleast_1d(stdRefH)
+        factor = np.atleast_1d(factor)
+        
+        # absolute input and output directories
+        inDir = os.path.abspath(relInDir)
+        outDir = os.path.abspath(relOutDir)
+        
+        # check, if output dir exists
+        if not os.path.isdir(outDir):
+            os.makedirs(outDir)
+        
+        # all images in input dir, sorted for deterministic results
+        imgFiles = list(fh.iterImgs(inDir,
+                                    patterns,
+                                    recursive,
+                                    exclude = (outDir,)))
+        
+        nObj = np.zeros(len(imgFiles), np.int64)
+        nColObj = np.zeros((len(imgFiles),
+                            len(meanRefH),
+                            len(stdRefH),
+                            len(factor)), np.int64)
+        
+        # parameter combinations in output order
+        grid = np.stack(np.meshgrid(meanRefH,
+                                    stdRefH,
+                                    factor,
+                                    indexing = 'ij'), -1).reshape(-1, 3)
+        
+        with open(os.path.join(outDir, 'sweep.csv'), 'w') as sweepFile:
+            sweepFile.write('imgName meanRefH stdRefH factor nObj nColObj\n')
+            
+            for i, imgFile in enumerate(imgFiles):
+                
+                # read input image
+                imgIn = fh.readImgIn(inDir, imgFile)
+                
+                # detect objects and their colors once
+                meanH = self.detectMeanH(imgIn)
+                
+                # evaluate whole parameter grid
+                nObj[i] = len(meanH)
+                nColObj[i] = self.countColObj(meanH, meanRefH, stdRefH, factor)
+                
+                lines = [imgFile + ' ' + str(m) + ' ' + str(s) + ' ' + str(f) +
+                         ' ' + str(nObj[i]) + ' ' + str(n) + '\n'
+                         for (m, s, f), n in zip(grid, nColObj[i].ravel())]
+                sweepFile.writelines(lines)
+                sweepFile.flush()
         
-        # go back to working dir
-        os.chdir('..')
+        return imgFiles, nObj, nColObj
@@ -8,10 +8,216 @@ Created on Thu Aug  5 13:11:49 2021
 
 
 import os
+import fnmatch
+import threading
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import cv2
 
 
+# file extensions of readable input images
+imgFormats = ('.jpg', '.jpeg', '.jpe', '.png', '.tif', '.tiff', '.bmp')
+
+
+def iterImgs(inDir,
+             patterns = None,
+             recursive = False,
+             formats = imgFormats,
+             exclude = (),
+             sort = True):
+    """
+    Enumerate input images lazily. Directories are scanned one at a time
+    and images are yielded as they are found, so processing can start
+    before large trees are listed completely.
+
+    Parameters
+    ----------
+    inDir : string
+        absolute input directory.
+    patterns : list, optional
+        glob patterns, of which image paths relative to input directory
+        have to match one, e.g. ["plate*/*.png"]. The default is None,
+        i.e. all images.
+    recursive : bool, optional
+        descend into subdirectories, not following symbolic links to
+        directories. The default is False.
+    formats : tuple, optional
+        accepted file extensions, in any case. The default is imgFormats.
+    exclude : tuple, optional
+        directories to skip, e.g. output directory. The default is ().
+    sort : bool, optional
+        yield images of each directory sorted by name for deterministic
+        results. Otherwise, in order of directory entries.
+        The default is True.
+
+    Yields
+    ------
+    imgFile : string
+        image path relative to input directory, separated by "/".
+
+    """
+    
+    exclude = {os.path.realpath(d) for d in exclude}
+    
+    # directories still to scan with their relative prefix
+    dirs = [(inDir, '')]
+    
+    while dirs:
+        path, prefix = dirs.pop()
+        subDirs = []
+        
+        with os.scandir(path) as entries:
+            if sort:
+                entries = sorted(entries, key = lambda entry: entry.name)
+            
+            for entry in entries:
+                relPath = prefix + entry.name
+                
+                # symbolic links to directories may form loops
+                if entry.is_dir(follow_symlinks = False):
+                    if recursive and os.path.realpath(entry.path) not in exclude:
+                        subDirs.append((entry.path, relPath + '/'))
+                    continue
+                
+                if (os.path.splitext(entry.name)[1].lower() not in formats or
+                    not entry.is_file()):
+                    continue
+                
+                if patterns and not any(fnmatch.fnmatch(relPath, pattern)
+                                        for pattern in patterns):
+                    continue
+                
+                yield relPath
+        
+        # scan subdirectories in order
+        dirs.extend(reversed(subDirs))
+
+
+def openStack(stackPath, frameShape = None):
+    """
+    Open stack of BGR frames with shape (N, H, W, 3) as read-only memory
+    map. Frames are views into the mapped file, so they are read on access
+    without decoding or copying.
+
+    Parameters
+    ----------
+    stackPath : string
+        path to .npy file or raw file of uint8 values.
+    frameShape : tuple, optional
+        frame height and width of raw file. Number of frames is inferred
+        from file size. The default is None, i.e. .npy file.
+
+    Returns
+    -------
+    stack : numpy memmap
+        frame stack.
+
+    """
+    
+    if frameShape is None:
+        if not stackPath.endswith('.npy'):
+            raise ValueError("Raw stacks require frame shape.")
+        stack = np.load(stackPath, mmap_mode = 'r')
+    else:
+        frameSize = frameShape[0] * frameShape[1] * 3
+        nFrames = os.path.getsize(stackPath) // frameSize
+        stack = np.memmap(stackPath,
+                          dtype = np.uint8,
+                          mode = 'r',
+                          shape = (nFrames, frameShape[0], frameShape[1], 3))
+    
+    if stack.ndim != 4 or stack.shape[3] != 3 or stack.dtype != np.uint8:
+        raise ValueError("Stack has to be of shape (N, H, W, 3) and type uint8.")
+    
+    if not stack.flags['C_CONTIGUOUS']:
+        raise ValueError("Stack has to be stored in C order.")
+    
+    return stack
+
+
+def frameFiles(stackPath, nFrames, ext = '.png'):
+    """
+    Get names of frames in stack, used like input image filenames.
+
+    Parameters
+    ----------
+    stackPath : string
+        path to stack file.
+    nFrames : int
+        number of frames.
+    ext : string, optional
+        extension of output images. The default is ".png".
+
+    Returns
+    -------
+    frameFiles : list
+        frame names, i.e. stack name and zero-padded frame number.
+
+    """
+    
+    name = os.path.splitext(os.path.basename(stackPath))[0]
+    digits = len(str(max(nFrames - 1, 0)))
+    
+    return [name + '/' + str(i).zfill(digits) + ext for i in range(nFrames)]
+
+
+def openVideo(source):
+    """
+    Open video file or camera for reading.
+
+    Parameters
+    ----------
+    source : string or int
+        path to video file or index of camera.
+
+    Returns
+    -------
+    capture : cv2.VideoCapture
+        opened video capture.
+
+    """
+    
+    capture = cv2.VideoCapture(source)
+    
+    if not capture.isOpened():
+        raise ValueError("Cannot open video source " + str(source) + ".")
+    
+    return capture
+
+
+def iterFrames(capture, maxFrames = None):
+    """
+    Read frames of opened video capture one at a time until its end.
+    Capture is released afterwards.
+
+    Parameters
+    ----------
+    capture : cv2.VideoCapture
+        opened video capture.
+    maxFrames : int, optional
+        maximum number of frames to read, e.g. from cameras.
+        The default is None, i.e. all frames.
+
+    Yields
+    ------
+    frame : numpy array
+        BGR frame.
+
+    """
+    
+    try:
+        for _ in itertools.count() if maxFrames is None else range(maxFrames):
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield frame
+    finally:
+        capture.release()
+
+
 def readImgIn(inDir, imgFile):
     """
     Read input image.
@@ -31,7 +237,7 @@ def readImgIn(inDir, imgFile):
     """
     
     # path to image input file
-    imgInPath = inDir + os.sep + imgFile
+    imgInPath = os.path.join(inDir, imgFile)
             
     # read BGR input image                
     imgIn = cv2.imread(imgInPath)
@@ -39,6 +245,48 @@ def readImgIn(inDir, imgFile):
     return imgIn
 
 
+def prefetchImgs(inDir, imgFiles, depth = 2, workers = 2):
+    """
+    Read input images ahead on a thread pool, while the current one is
+    processed. At most depth images are read ahead, bounding memory.
+
+    Parameters
+    ----------
+    inDir : string
+        absolute input directory.
+    imgFiles : iterable
+        input image filenames.
+    depth : int, optional
+        number of images to read ahead. The default is 2.
+    workers : int, optional
+        number of reading threads. The default is 2.
+
+    Yields
+    ------
+    imgFile : string
+        input image filename.
+    imgIn : numpy array
+        input image.
+
+    """
+    
+    imgFiles = iter(imgFiles)
+    
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+        pending = deque((imgFile, executor.submit(readImgIn, inDir, imgFile))
+                        for imgFile in itertools.islice(imgFiles, depth))
+        
+        while pending:
+            imgFile, future = pending.popleft()
+            
+            # keep reading ahead
+            for nextFile in itertools.islice(imgFiles, 1):
+                pending.append((nextFile,
+                                executor.submit(readImgIn, inDir, nextFile)))
+            
+            yield imgFile, future.result()
+
+
 def saveImgOut(outDir, imgFile, imgOut):
     """
     Save image with ROIs around objects 
@@ -59,22 +307,151 @@ def saveImgOut(outDir, imgFile, imgOut):
     """
     
     # set output file path
-    outPath = outDir + '/' + imgFile[:-4] + '_res' + imgFile[-4:]
+    outPath = imgOutPath(outDir, imgFile)
+    
+    # mirror subdirectories of input images
+    os.makedirs(os.path.dirname(outPath), exist_ok = True)
     
     # write image to path
     cv2.imwrite(outPath, imgOut)
 
+
+def imgOutPath(outDir, imgFile):
+    """
+    Get path of output image to input image.
+
+    Parameters
+    ----------
+    outDir : string
+        path to output directory.
+    imgFile : string
+        input image file name.
+
+    Returns
+    -------
+    outPath : string
+        output image file path.
+
+    """
+    
+    root, ext = os.path.splitext(imgFile)
+    
+    return os.path.join(outDir, root + '_res' + ext)
+
+
+def imgStamp(inDir, imgFile):
+    """
+    Get stamp of input image to recognize changed files.
+
+    Parameters
+    ----------
+    inDir : string
+        absolute input directory.
+    imgFile : string
+        input image filename.
+
+    Returns
+    -------
+    stamp : tuple
+        file size in bytes and modification time in ns.
+
+    """
+    
+    stat = os.stat(os.path.join(inDir, imgFile))
     
-def saveResults(outDir, results):
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def readIndex(outDir):
     """
-    Save detection results to file.
+    Read index of already processed images from output directory.
+
+    Parameters
+    ----------
+    outDir : string
+        path to output directory.
+
+    Returns
+    -------
+    index : dict
+        stamp of each processed image by filename.
+
+    """
+    
+    index = {}
+    indexPath = os.path.join(outDir, 'index.dat')
     
+    if not os.path.isfile(indexPath):
+        return index
+    
+    with open(indexPath) as indexFile:
+        for line in indexFile:
+            # skip incomplete lines of interrupted runs
+            if not line.endswith('\n'):
+                continue
+            
+            # filenames may contain spaces
+            entry = line[:-1].rsplit(' ', 2)
+            if len(entry) != 3:
+                continue
+            
+            # later entries replace earlier ones
+            index[entry[0]] = (int(entry[1]), int(entry[2]))
+            
+    return index
+
+
+def keepResults(outDir, imgFiles):
+    """
+    Keep only results and index entries of given images in output directory,
+    e.g. before processing all other images again.
+
     Parameters
     ----------
     outDir : string
         path to output directory.
-    results : list of lists
-        results list for each image.
+    imgFiles : set
+        input image filenames to keep.
+
+    Returns
+    -------
+    None.
+
+    """
+    
+    for fileName in ['results.csv', 'index.dat']:
+        path = os.path.join(outDir, fileName)
+        
+        if not os.path.isfile(path):
+            continue
+        
+        with open(path) as inFile:
+            lines = inFile.readlines()
+        
+        # keep header and lines of given images
+        kept = [line for i, line in enumerate(lines)
+                if (fileName == 'results.csv' and i == 0) or
+                (line.endswith('\n') and line[:-1].rsplit(' ', 2)[0] in imgFiles)]
+        
+        if len(kept) == len(lines):
+            continue
+        
+        # replace file at once
+        writeAtomic(path, kept)
+
+    
+def writeAtomic(path, lines):
+    """
+    Write lines to file at once. Lines are written to a temporary file
+    unique to process and thread, which then replaces the file, so readers
+    and concurrent writers never see a partial file.
+
+    Parameters
+    ----------
+    path : string
+        file path.
+    lines : list
+        lines including line breaks.
 
     Returns
     -------
@@ -82,25 +459,223 @@ def saveResults(outDir, results):
 
     """
     
+    tmpPath = (path + '.' + str(os.getpid()) + '.' +
+               str(threading.get_ident()) + '.tmp')
+    
+    try:
+        with open(tmpPath, 'w') as outFile:
+            outFile.writelines(lines)
+            outFile.flush()
+            os.fsync(outFile.fileno())
+        os.replace(tmpPath, path)
+    finally:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+
+
+class ResultsWriter():
+    """
+    Class for streaming detection results to file. Each result is appended
+    and flushed as soon as it is written, so that results of long runs are
+    kept, even if the run is interrupted. Stamps of processed images are
+    written to an index file alongside for resuming runs.
+    
+    """
+    
     header = 'imgName nObj nColObj\n'
     
-    # check, if output dir exists
-    if not os.path.isdir(outDir):
-        os.mkdir(outDir)
+    def __init__(self, outDir, append = False):
+        """
+        Constructor. Opens results file in output directory.
+
+        Parameters
+        ----------
+        outDir : string
+            path to output directory.
+        append : bool, optional
+            append to existing results file instead of overwriting it.
+            The default is False.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        # check, if output dir exists
+        if not os.path.isdir(outDir):
+            os.makedirs(outDir)
+        
+        self.path = os.path.join(outDir, 'results.csv')
+        
+        # serializes writes of several threads
+        self.lock = threading.Lock()
+        
+        # only write header to new or empty files
+        newFile = (not append or not os.path.isfile(self.path) or
+                   os.path.getsize(self.path) == 0)
+        
+        self.resFile = open(self.path, 'a' if append else 'w')
+        self.indexFile = open(os.path.join(outDir, 'index.dat'),
+                              'a' if append else 'w')
+        
+        if newFile:
+            self.resFile.write(self.header)
+            self.resFile.flush()
+        
+    def __enter__(self):
+        return self
     
-    # go to output dir
-    os.chdir(outDir)
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        
+    def write(self, result, stamp = None):
+        """
+        Append result of one image to file.
+
+        Parameters
+        ----------
+        result : tuple
+            image filename, number of objects and number of colored objects.
+        stamp : tuple, optional
+            stamp of input image to add to index. The default is None.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        line = str(result[0]) + ' ' + str(result[1]) + ' ' + str(result[2]) + '\n'
+        
+        with self.lock:
+            # single write to appended file, flushed to disk
+            self.resFile.write(line)
+            self.resFile.flush()
+            os.fsync(self.resFile.fileno())
+            
+            # index image only after its result is safely written
+            if stamp is not None:
+                line = result[0] + ' ' + str(stamp[0]) + ' ' + str(stamp[1]) + '\n'
+                self.indexFile.write(line)
+                self.indexFile.flush()
+            
+    def close(self):
+        """
+        Close results file.
 
-    # write results to file
-    resFile = open('results.csv', 'w')
+        Returns
+        -------
+        None.
+
+        """
+        
+        with self.lock:
+            if not self.resFile.closed:
+                self.resFile.close()
+                self.indexFile.close()
+
+
+class AsyncWriter():
+    """
+    Class for saving output images on a thread pool. At most depth images
+    are pending, further writes wait for the oldest one to finish. Saved
+    images are reported in order of writing, e.g. to record their results
+    only after the image is on disk.
+    
+    """
+    
+    def __init__(self, depth = 2, workers = 2, onSaved = None):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        depth : int, optional
+            maximum number of pending images. The default is 2.
+        workers : int, optional
+            number of writing threads. The default is 2.
+        onSaved : callable, optional
+            called with result of each saved image. The default is None.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        self.depth = max(depth, 1)
+        self.onSaved = onSaved
+        self.executor = ThreadPoolExecutor(max_workers = workers)
+        self.pending = deque()
+        
+    def __enter__(self):
+        return self
     
-    resFile.write(header)
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        
+    def write(self, outDir, imgFile, imgOut, result = None):
+        """
+        Save output image in background.
+
+        Parameters
+        ----------
+        outDir : string
+            path to output directory.
+        imgFile : string
+            input image file name.
+        imgOut : numpy array
+            output image, not to be modified afterwards.
+        result : tuple, optional
+            result of image, passed on when saved. The default is None.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        # wait for oldest images to cap memory
+        while len(self.pending) >= self.depth:
+            self.finish()
+        
+        future = self.executor.submit(saveImgOut, outDir, imgFile, imgOut)
+        self.pending.append((future, result))
+        
+        # report images already saved
+        while self.pending and self.pending[0][0].done():
+            self.finish()
     
-    for result in results:
-        line = result[0] + ' ' + result[1] + ' ' + result[2] + '\n'
-        resFile.write(line)
+    def finish(self):
+        """
+        Wait for oldest pending image and report it. Errors of saving are
+        raised here.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        future, result = self.pending.popleft()
+        future.result()
         
-    resFile.close()
+        if self.onSaved is not None:
+            self.onSaved(result)
     
-    # go back to working dir
-    os.chdir('..')
\ No newline at end of file
+    def close(self):
+        """
+        Wait for all pending images and stop threads.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        try:
+            while self.pending:
+                self.finish()
+        finally:
+            self.executor.shutdown()
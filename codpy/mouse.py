@@ -7,8 +7,59 @@ Created on Thu Aug  5 13:12:38 2021
 """
 
 
+import numpy as np
 import cv2
 
+from codpy.spatial_index import SpatialIndex
+
+
+# classes of centers in spatial index
+NOROI = 0
+ROI = 1
+
+
+def drawBoxes(img, centers, boxSize, color, lineWidth, offset = (0, 0)):
+    """
+    Draw fixed-sized boxes around all centers with a single call.
+    Pixels are the same as drawing each box with cv2.rectangle.
+
+    Parameters
+    ----------
+    img : numpy array
+        image to draw into.
+    centers : array like
+        box centers with shape (n, 2).
+    boxSize : float
+        side length of boxes.
+    color : tuple
+        box line color (BGR).
+    lineWidth : int
+        box line width.
+    offset : tuple, optional
+        image origin in center coordinates. The default is (0, 0).
+
+    Returns
+    -------
+    None.
+
+    """
+    
+    centers = np.asarray(centers, np.float64).reshape(-1, 2)
+    if len(centers) == 0:
+        return
+    
+    # box corners, truncated like int() in single box drawing
+    lo = (centers - boxSize/2).astype(np.int32) - np.int32(offset)
+    hi = (centers + boxSize/2).astype(np.int32) - np.int32(offset)
+    
+    # closed polygons of all boxes
+    boxes = np.stack((lo,
+                      np.stack((hi[:, 0], lo[:, 1]), 1),
+                      hi,
+                      np.stack((lo[:, 0], hi[:, 1]), 1)), 1)
+    
+    cv2.polylines(img, boxes, True, color, lineWidth)
+
 
 class Callbacks():
     """
@@ -60,9 +111,14 @@ class Callbacks():
         self.boxColorNoROI = param[2]
         self.boxColorROI = param[3]
         
-        # lists of No-ROI and ROI centers
-        self.NoROICenters = []
-        self.ROICenters = []
+        # spatial index of No-ROI and ROI centers
+        self.index = SpatialIndex(self.boxSize)
+        
+        # whole output image needs re-drawing
+        self.dirty = True
+        
+        # centers, whose surroundings need re-drawing
+        self.changed = []
         
     def setCenters(self, NoROICenters = [], ROICenters = []):
         """
@@ -81,8 +137,44 @@ class Callbacks():
 
         """
         
-        self.NoROICenters = NoROICenters
-        self.ROICenters = ROICenters
+        # re-build spatial index
+        self.index = SpatialIndex(self.boxSize,
+                                  max(len(NoROICenters) + len(ROICenters), 64))
+        
+        for center in NoROICenters:
+            self.index.insert(center, NOROI)
+        for center in ROICenters:
+            self.index.insert(center, ROI)
+        
+        self.dirty = True
+        
+    @property
+    def NoROICenters(self):
+        """
+        No-ROI centers in order of selection.
+
+        Returns
+        -------
+        list
+            No-ROI centers.
+
+        """
+        
+        return self.index.centers(NOROI)
+    
+    @property
+    def ROICenters(self):
+        """
+        ROI centers in order of selection.
+
+        Returns
+        -------
+        list
+            ROI centers.
+
+        """
+        
+        return self.index.centers(ROI)
     
     def getCenters(self):
         """
@@ -114,7 +206,87 @@ class Callbacks():
     
     def markROIs(self):
         """
-        Mark regions of interest in image.
+        Mark regions of interest in image and show it.
+        Only re-draws and shows the image, if ROIs changed since last call.
+        Single changes are re-drawn around the changed center only.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        if self.dirty:
+            self.drawROIs()
+        elif self.changed:
+            for center in self.changed:
+                self.redrawROIs(center)
+        else:
+            return
+        
+        self.dirty = False
+        self.changed = []
+        
+        cv2.imshow(self.title, self.imgOut)
+    
+    def redrawROIs(self, center):
+        """
+        Re-draw regions of interest around a center into output image.
+        The surrounding patch is restored from input image and all boxes
+        reaching into it are drawn again in the same order as in drawROIs.
+
+        Parameters
+        ----------
+        center : tuple
+            changed center.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        height, width = self.img.shape[:2]
+        
+        # patch covering box around center including line width
+        half = self.boxSize / 2 + self.lineWidth + 1
+        x0 = max(int(center[0] - half), 0)
+        y0 = max(int(center[1] - half), 0)
+        x1 = min(int(center[0] + half) + 1, width)
+        y1 = min(int(center[1] + half) + 1, height)
+        
+        if x0 >= x1 or y0 >= y1:
+            return
+        
+        # restore patch from input image
+        patch = self.img[y0:y1, x0:x1].copy()
+        
+        # boxes with centers in this range can reach into patch
+        reach = self.boxSize + 2 * self.lineWidth + 2
+        
+        ids = self.index.near(center[0], center[1], reach)
+        coords = np.stack((self.index.xs[ids], self.index.ys[ids]), 1)
+        isROI = self.index.cls[ids] == ROI
+        
+        # No-ROIs first, then ROIs, shifted to patch coordinates
+        drawBoxes(patch,
+                  coords[~isROI],
+                  self.boxSize,
+                  self.boxColorNoROI,
+                  self.lineWidth,
+                  (x0, y0))
+        drawBoxes(patch,
+                  coords[isROI],
+                  self.boxSize,
+                  self.boxColorROI,
+                  self.lineWidth,
+                  (x0, y0))
+        
+        self.imgOut[y0:y1, x0:x1] = patch
+    
+    def drawROIs(self):
+        """
+        Draw regions of interest into output image without showing it.
 
         Returns
         -------
@@ -125,27 +297,19 @@ class Callbacks():
         # re-new output image
         self.imgOut = self.img.copy()
         
-        # mark No-ROIs with bounding box of first color
-        for i in range(len(self.NoROICenters)):
-            cv2.rectangle(self.imgOut,
-                          (int(self.NoROICenters[i][0]-self.boxSize/2),
-                           int(self.NoROICenters[i][1]-self.boxSize/2)),
-                          (int(self.NoROICenters[i][0]+self.boxSize/2),
-                           int(self.NoROICenters[i][1]+self.boxSize/2)),
-                          self.boxColorNoROI,
-                          self.lineWidth)
-        
-        # mark ROIs with bounding box of second color
-        for i in range(len(self.ROICenters)):
-            cv2.rectangle(self.imgOut,
-                          (int(self.ROICenters[i][0]-self.boxSize/2),
-                           int(self.ROICenters[i][1]-self.boxSize/2)),
-                          (int(self.ROICenters[i][0]+self.boxSize/2),
-                           int(self.ROICenters[i][1]+self.boxSize/2)),
-                          self.boxColorROI,
-                          self.lineWidth)
+        # mark No-ROIs with bounding boxes of first color
+        drawBoxes(self.imgOut,
+                  self.index.coords(NOROI),
+                  self.boxSize,
+                  self.boxColorNoROI,
+                  self.lineWidth)
         
-        cv2.imshow(self.title, self.imgOut)
+        # mark ROIs with bounding boxes of second color on top
+        drawBoxes(self.imgOut,
+                  self.index.coords(ROI),
+                  self.boxSize,
+                  self.boxColorROI,
+                  self.lineWidth)
     
     def selectROI(self):
         """
@@ -157,34 +321,17 @@ class Callbacks():
 
         """
         
-        done = False 
-        
-        # temp lists to delete from during loop
-        NoROICentersTemp = self.NoROICenters.copy()
-        ROICentersTemp = self.ROICenters.copy()
-        
-        # check, if center falls within No-ROI list
-        for i in range(len(self.NoROICenters)):
-            if ((self.center[0] > self.NoROICenters[i][0]-self.boxSize/2) and
-                (self.center[1] > self.NoROICenters[i][1]-self.boxSize/2) and                
-                (self.center[0] < self.NoROICenters[i][0]+self.boxSize/2) and
-                (self.center[1] < self.NoROICenters[i][1]+self.boxSize/2)):
-                
-                done = True
-                
-                # if already No-ROI, append to ROIs
-                ROICentersTemp.append(self.NoROICenters[i])
-                # and delete from temp No-ROI
-                del NoROICentersTemp[i]
-                break
-            
-        # if center wasn't found in NoROIs 
-        if not done:
-            NoROICentersTemp.append(self.center)
+        # check, if center falls within No-ROI
+        i = self.index.hit(self.center[0], self.center[1], NOROI)
         
-        # set lists to temp lists
-        self.ROICenters = ROICentersTemp
-        self.NoROICenters = NoROICentersTemp
+        if i is not None:
+            # if already No-ROI, move to ROIs
+            self.index.move(i, ROI)
+            self.changed.append(self.index.items[i])
+        else:
+            # if center wasn't found in NoROIs
+            self.index.insert(self.center, NOROI)
+            self.changed.append(self.center)
         
     def deselectROI(self):
         """
@@ -196,43 +343,22 @@ class Callbacks():
 
         """
         
-        done = False
+        # check, if center falls within ROI
+        i = self.index.hit(self.center[0], self.center[1], ROI)
         
-        # temp lists to delete from during loop
-        NoROICentersTemp = self.NoROICenters.copy()
-        ROICentersTemp = self.ROICenters.copy()
+        if i is not None:
+            # move de-selected ROI to No-ROIs
+            self.index.move(i, NOROI)
+            self.changed.append(self.index.items[i])
+            return
         
-        # check, if center falls within ROI
-        for i in range(len(self.ROICenters)):
-            if ((self.center[0] > self.ROICenters[i][0]-self.boxSize/2) and
-                (self.center[1] > self.ROICenters[i][1]-self.boxSize/2) and                
-                (self.center[0] < self.ROICenters[i][0]+self.boxSize/2) and
-                (self.center[1] < self.ROICenters[i][1]+self.boxSize/2)):
-                
-                done = True
-                
-                # delete de-selected ROI from temp ROI list
-                del ROICentersTemp[i]
-                # and append to No-ROIs
-                NoROICentersTemp.append(self.ROICenters[i])
-                break
-            
-        # if center wasn't found in ROIs
-        if not done:
-            # check, if center falls within No-ROI
-            for i in range(len(self.NoROICenters)):
-                if ((self.center[0] > self.NoROICenters[i][0]-self.boxSize/2) and
-                    (self.center[1] > self.NoROICenters[i][1]-self.boxSize/2) and                
-                    (self.center[0] < self.NoROICenters[i][0]+self.boxSize/2) and
-                    (self.center[1] < self.NoROICenters[i][1]+self.boxSize/2)):
-                    
-                    # delete de-selected ROI from temp ROI list
-                    del NoROICentersTemp[i]
-                    break
-                
-        # set lists to temp lists
-        self.ROICenters = ROICentersTemp
-        self.NoROICenters = NoROICentersTemp
+        # if center wasn't found in ROIs, check No-ROIs
+        i = self.index.hit(self.center[0], self.center[1], NOROI)
+        
+        if i is not None:
+            # delete de-selected No-ROI
+            self.changed.append(self.index.items[i])
+            self.index.remove(i)
         
     def selectFixedROIs(self, event, x, y, flags, param):
         """
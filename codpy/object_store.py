@@ -0,0 +1,712 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import glob
+import shutil
+import threading
+import numpy as np
+from numpy.lib import format as npFormat
+
+import codpy.records as rec
+import codpy.file_handling as fh
+
+
+# row of object table, id of image followed by object record
+tableDtype = np.dtype([('imgId', np.int32)] + rec.objDtype.descr)
+
+
+def importParquet():
+    """
+    Import optional pyarrow modules for Parquet files.
+
+    Returns
+    -------
+    pa : module
+        pyarrow.
+    pq : module
+        pyarrow.parquet.
+
+    """
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet object tables require pyarrow.")
+
+    return pa, pq
+
+
+def readImages(objDir):
+    """
+    Read ids of images with recorded objects.
+
+    Parameters
+    ----------
+    objDir : string
+        path to object table directory.
+
+    Returns
+    -------
+    images : dict
+        image filename by id. Later ids of same image replace earlier ones.
+
+    """
+
+    images = {}
+    path = os.path.join(objDir, 'images.csv')
+
+    if not os.path.isfile(path):
+        return images
+
+    with open(path) as imagesFile:
+        # skip header
+        next(imagesFile, None)
+
+        for line in imagesFile:
+            # skip incomplete lines of interrupted runs
+            if not line.endswith('\n'):
+                continue
+
+            entry = line[:-1].split(' ', 1)
+            if len(entry) == 2 and entry[1]:
+                images[int(entry[0])] = entry[1]
+
+    # keep latest id of each image
+    latest = {imgFile: imgId for imgId, imgFile in sorted(images.items())}
+
+    return {imgId: imgFile for imgFile, imgId in latest.items()}
+
+
+def partPaths(objDir):
+    """
+    Get paths of table parts written since the last consolidation.
+
+    Parameters
+    ----------
+    objDir : string
+        path to object table directory.
+
+    Returns
+    -------
+    paths : list
+        paths of parts, ordered by ids.
+
+    """
+
+    return sorted(glob.glob(os.path.join(objDir, 'part_*.npy')) +
+                  glob.glob(os.path.join(objDir, 'part_*.parquet')))
+
+
+def partEnd(path):
+    """
+    Get id following the ids of a table part, encoded in its filename.
+
+    Parameters
+    ----------
+    path : string
+        path to part.
+
+    Returns
+    -------
+    endId : int
+        id following the last id of part.
+
+    """
+
+    return int(os.path.basename(path).split('.')[0][len('part_'):])
+
+
+def readPart(path):
+    """
+    Read table part.
+
+    Parameters
+    ----------
+    path : string
+        path to .npy or .parquet part.
+
+    Returns
+    -------
+    part : dict
+        array of each column.
+
+    """
+
+    if path.endswith('.parquet'):
+        pa, pq = importParquet()
+        data = pq.read_table(path)
+        return {name: data.column(name).to_numpy() for name in tableDtype.names}
+
+    part = np.load(path, mmap_mode = 'r')
+
+    return {name: part[name] for name in tableDtype.names}
+
+
+def writePart(path, table):
+    """
+    Write table part at once, so readers never see partial parts.
+
+    Parameters
+    ----------
+    path : string
+        path to .npy or .parquet part.
+    table : numpy array
+        rows of table.
+
+    Returns
+    -------
+    None.
+
+    """
+
+    with open(path + '.tmp', 'wb') as partFile:
+        if path.endswith('.parquet'):
+            pa, pq = importParquet()
+            pq.write_table(pa.table({name: table[name] for name in tableDtype.names}),
+                           partFile)
+        else:
+            np.save(partFile, table)
+        partFile.flush()
+        os.fsync(partFile.fileno())
+
+    os.replace(path + '.tmp', path)
+
+
+def tableDir(objDir):
+    """
+    Get directory of consolidated .npy table. Each consolidation writes a
+    new generation directory, which the manifest table.txt is switched to
+    at once, so that readers never see columns of different generations.
+
+    Parameters
+    ----------
+    objDir : string
+        path to object table directory.
+
+    Returns
+    -------
+    path : string or None
+        path to current generation directory. None, if not consolidated yet.
+
+    """
+
+    path = os.path.join(objDir, 'table.txt')
+
+    if not os.path.isfile(path):
+        return None
+
+    with open(path) as manifestFile:
+        name = manifestFile.read().strip()
+
+    return os.path.join(objDir, name)
+
+
+def loadColumns(objDir, columns, mmap = True):
+    """
+    Load columns of consolidated .npy table.
+
+    Parameters
+    ----------
+    objDir : string
+        path to object table directory.
+    columns : list
+        columns to load.
+    mmap : bool, optional
+        memory map columns instead of reading them. The default is True.
+
+    Returns
+    -------
+    table : dict
+        array of each column.
+
+    """
+
+    path = tableDir(objDir)
+
+    table = {name: np.load(os.path.join(path, name + '.npy'),
+                           mmap_mode = 'r' if mmap else None)
+             for name in columns}
+
+    if len({len(column) for column in table.values()}) > 1:
+        raise ValueError("Columns of object table in " + path +
+                         " differ in length.")
+
+    return table
+
+
+def tableFormat(objDir):
+    """
+    Get format of consolidated object table.
+
+    Parameters
+    ----------
+    objDir : string
+        path to object table directory.
+
+    Returns
+    -------
+    fileFormat : string or None
+        "npy" or "parquet". None, if not consolidated yet.
+
+    """
+
+    if os.path.isfile(os.path.join(objDir, 'objects.parquet')):
+        return 'parquet'
+    if tableDir(objDir) is not None:
+        return 'npy'
+
+    return None
+
+
+def iterTable(objDir, fileFormat, blockSize = 2**16):
+    """
+    Iterate over consolidated object table in blocks.
+
+    Parameters
+    ----------
+    objDir : string
+        path to object table directory.
+    fileFormat : string
+        "npy" or "parquet".
+    blockSize : int, optional
+        number of rows per block. The default is 2**16.
+
+    Yields
+    ------
+    block : dict
+        array of each column.
+
+    """
+
+    if fileFormat == 'parquet':
+        path = os.path.join(objDir, 'objects.parquet')
+        if not os.path.isfile(path):
+            return
+
+        pa, pq = importParquet()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size = blockSize):
+            yield {name: batch.column(batch.schema.get_field_index(name))
+                             .to_numpy(zero_copy_only = False)
+                   for name in tableDtype.names}
+        return
+
+    if tableDir(objDir) is None:
+        return
+
+    columns = loadColumns(objDir, tableDtype.names)
+
+    for i in range(0, len(columns['imgId']), blockSize):
+        yield {name: column[i:i + blockSize]
+               for name, column in columns.items()}
+
+
+def readTableIds(objDir, fileFormat, blockSize = 2**16):
+    """
+    Read ids of images in consolidated object table.
+
+    Parameters
+    ----------
+    objDir : string
+        path to object table directory.
+    fileFormat : string
+        "npy" or "parquet".
+    blockSize : int, optional
+        number of rows per block. The default is 2**16.
+
+    Returns
+    -------
+    tableIds : numpy array
+        unique ids.
+
+    """
+
+    tableIds = [np.unique(block['imgId'])
+                for block in iterTable(objDir, fileFormat, blockSize)]
+
+    if not tableIds:
+        return np.zeros(0, np.int32)
+
+    return np.unique(np.concatenate(tableIds))
+
+
+def iterKept(objDir, fileFormat, paths, keepIds, tableIds, blockSize):
+    """
+    Iterate over rows of consolidated table and parts to keep, i.e. rows
+    of recorded images not yet in consolidated table.
+
+    Parameters
+    ----------
+    objDir : string
+        path to object table directory.
+    fileFormat : string
+        "npy" or "parquet".
+    paths : list
+        paths of parts.
+    keepIds : numpy array
+        ids of recorded images.
+    tableIds : numpy array
+        ids of images in consolidated table.
+    blockSize : int
+        number of rows per block of consolidated table.
+
+    Yields
+    ------
+    block : dict
+        array of each column.
+
+    """
+
+    for block in iterTable(objDir, fileFormat, blockSize):
+        keep = np.isin(block['imgId'], keepIds)
+        yield {name: column[keep] for name, column in block.items()}
+
+    for path in paths:
+        part = readPart(path)
+        keep = (np.isin(part['imgId'], keepIds) &
+                ~np.isin(part['imgId'], tableIds))
+        yield {name: column[keep] for name, column in part.items()}
+
+
+def consolidate(objDir, fileFormat = 'npy', blockSize = 2**16):
+    """
+    Merge table parts into the consolidated object table. Rows of images
+    processed again and of unrecorded images are dropped. Part rows already
+    merged by an interrupted consolidation are skipped. As the whole table
+    is rewritten, resumed runs only add parts, and their consolidation is
+    left to an explicit call.
+
+    Parameters
+    ----------
+    objDir : string
+        path to object table directory.
+    fileFormat : string, optional
+        "npy" for one memory mappable .npy file per column or "parquet".
+        The default is "npy".
+    blockSize : int, optional
+        number of rows per block. The default is 2**16.
+
+    Returns
+    -------
+    None.
+
+    """
+
+    existing = tableFormat(objDir)
+    if existing is not None and existing != fileFormat:
+        raise ValueError("Object table is consolidated as " + existing + ".")
+
+    paths = partPaths(objDir)
+
+    # nothing to merge into existing table
+    if not paths and existing is not None:
+        return
+
+    images = readImages(objDir)
+    keepIds = np.array(sorted(images), np.int32)
+
+    # ids already in consolidated table
+    tableIds = readTableIds(objDir, fileFormat, blockSize)
+
+    tmpSuffix = '.' + str(os.getpid()) + '.tmp'
+
+    if fileFormat == 'parquet':
+        pa, pq = importParquet()
+        path = os.path.join(objDir, 'objects.parquet')
+        schema = pa.schema([(name, pa.from_numpy_dtype(tableDtype[name]))
+                            for name in tableDtype.names])
+
+        with pq.ParquetWriter(path + tmpSuffix, schema) as writer:
+            for block in iterKept(objDir, fileFormat, paths,
+                                  keepIds, tableIds, blockSize):
+                writer.write_table(pa.table(block, schema = schema))
+
+        os.replace(path + tmpSuffix, path)
+    else:
+        nRows = sum(len(block['imgId'])
+                    for block in iterKept(objDir, fileFormat, paths,
+                                          keepIds, tableIds, blockSize))
+
+        # write next generation, then switch manifest to it at once
+        current = tableDir(objDir)
+        generation = 0 if current is None else int(current.rsplit('_', 1)[1]) + 1
+        genName = 'table_' + str(generation).zfill(6)
+        path = os.path.join(objDir, genName)
+
+        # remove leftovers of interrupted consolidation
+        shutil.rmtree(path, ignore_errors = True)
+        os.makedirs(path)
+
+        columns = {name: npFormat.open_memmap(os.path.join(path, name + '.npy'),
+                                              mode = 'w+',
+                                              dtype = tableDtype[name],
+                                              shape = (nRows,))
+                   for name in tableDtype.names}
+
+        i = 0
+        for block in iterKept(objDir, fileFormat, paths,
+                              keepIds, tableIds, blockSize):
+            n = len(block['imgId'])
+            for name, column in columns.items():
+                column[i:i + n] = block[name]
+            i += n
+
+        for column in columns.values():
+            column.flush()
+        columns.clear()
+
+        fh.writeAtomic(os.path.join(objDir, 'table.txt'), [genName + '\n'])
+
+        # remove earlier generations
+        for oldPath in glob.glob(os.path.join(objDir, 'table_*')):
+            if os.path.basename(oldPath) != genName:
+                shutil.rmtree(oldPath, ignore_errors = True)
+
+    # only latest ids remain
+    fh.writeAtomic(os.path.join(objDir, 'images.csv'),
+                   [ObjectWriter.header] +
+                   [str(imgId) + ' ' + imgFile + '\n'
+                    for imgId, imgFile in sorted(images.items())])
+
+    for path in paths:
+        os.remove(path)
+
+
+def loadObjects(outDir, columns = None, mmap = True):
+    """
+    Load object table of a run. A consolidated .npy table is memory mapped.
+    Parts of resumed runs are merged in memory, keeping rows of the latest
+    id of each image.
+
+    Parameters
+    ----------
+    outDir : string
+        path to output directory.
+    columns : list, optional
+        columns to load. The default is None, i.e. all columns.
+    mmap : bool, optional
+        memory map .npy columns of a consolidated table without parts
+        instead of reading them. The default is True.
+
+    Returns
+    -------
+    images : dict
+        image filename by id.
+    table : dict
+        array of each column.
+
+    """
+
+    objDir = os.path.join(outDir, 'objects')
+
+    if columns is None:
+        columns = list(tableDtype.names)
+
+    images = readImages(objDir)
+    fileFormat = tableFormat(objDir)
+    paths = partPaths(objDir)
+
+    if paths or fileFormat is None:
+        # merge parts with consolidated table
+        blocks = list(iterKept(objDir,
+                               fileFormat,
+                               paths,
+                               np.array(sorted(images), np.int32),
+                               readTableIds(objDir, fileFormat),
+                               2**16))
+        table = {name: np.concatenate([block[name] for block in blocks])
+                 if blocks else np.zeros(0, tableDtype[name])
+                 for name in columns}
+    elif fileFormat == 'parquet':
+        pa, pq = importParquet()
+        data = pq.read_table(os.path.join(objDir, 'objects.parquet'),
+                             columns = columns)
+        table = {name: data.column(name).to_numpy() for name in columns}
+    else:
+        table = loadColumns(objDir, columns, mmap)
+
+    return images, table
+
+
+class ObjectWriter():
+    """
+    Class for writing object records of all images into one columnar
+    table. Each image gets an id, records are collected and written in
+    parts as the run progresses. On closing a new table, parts are
+    consolidated into one memory mappable .npy file per column or a Parquet
+    file. When appending, parts are kept, so that resumed runs only write
+    their new records. Ids and filenames of images, whose records are
+    written, are kept in images.csv.
+
+    """
+
+    header = 'imgId imgName\n'
+
+    def __init__(self, outDir, append = False, fileFormat = 'npy', chunkSize = 2**16):
+        """
+        Constructor. Opens object table in output directory.
+
+        Parameters
+        ----------
+        outDir : string
+            path to output directory.
+        append : bool, optional
+            append to existing table instead of overwriting it.
+            The default is False.
+        fileFormat : string, optional
+            "npy" or "parquet". The default is "npy".
+        chunkSize : int, optional
+            number of objects per part. The default is 2**16.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if fileFormat not in ('npy', 'parquet'):
+            raise ValueError("Unknown object table format " + str(fileFormat) + ".")
+
+        if fileFormat == 'parquet':
+            importParquet()
+
+        self.dir = os.path.join(outDir, 'objects')
+        self.fileFormat = fileFormat
+        self.append = append
+        self.chunkSize = chunkSize
+
+        # serializes writes of several threads
+        self.lock = threading.Lock()
+
+        os.makedirs(self.dir, exist_ok = True)
+
+        if append:
+            existing = tableFormat(self.dir)
+            if existing is not None and existing != fileFormat:
+                raise ValueError("Object table is consolidated as " + existing + ".")
+        else:
+            for path in glob.glob(os.path.join(self.dir, '*')):
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+
+        self.images = readImages(self.dir)
+
+        # ids follow ids of recorded images and of all parts, including
+        # parts of interrupted runs, whose images were not recorded
+        self.nextId = max([max(self.images) + 1 if self.images else 0] +
+                          [partEnd(path) for path in partPaths(self.dir)])
+
+        # records not yet written
+        self.pending = []
+        self.nPending = 0
+
+        path = os.path.join(self.dir, 'images.csv')
+        newFile = not os.path.isfile(path) or os.path.getsize(path) == 0
+
+        self.imagesFile = open(path, 'a')
+        if newFile:
+            self.imagesFile.write(self.header)
+            self.imagesFile.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def imgFiles(self):
+        """
+        Get images with recorded objects.
+
+        Returns
+        -------
+        imgFiles : set
+            image filenames.
+
+        """
+
+        return set(self.images.values())
+
+    def write(self, imgFile, objs):
+        """
+        Add object records of one image.
+
+        Parameters
+        ----------
+        imgFile : string
+            input image filename.
+        objs : numpy array
+            object records.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        table = np.empty(len(objs), tableDtype)
+        for name in rec.objDtype.names:
+            table[name] = objs[name]
+
+        with self.lock:
+            table['imgId'] = self.nextId
+            self.pending.append((self.nextId, imgFile, table))
+            self.nPending += len(table)
+            self.nextId += 1
+
+            if self.nPending >= self.chunkSize:
+                self.writeChunk()
+
+    def writeChunk(self):
+        """
+        Write pending records as part, then record their images.
+        Has to be called with lock held.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if not self.pending:
+            return
+
+        # parts are named by id following their ids
+        path = os.path.join(self.dir,
+                            'part_' + str(self.nextId).zfill(9) + '.' + self.fileFormat)
+
+        writePart(path, np.concatenate([table for _, _, table in self.pending]))
+
+        # images count as recorded only after their records are written
+        for imgId, imgFile, _ in self.pending:
+            self.imagesFile.write(str(imgId) + ' ' + imgFile + '\n')
+            self.images[imgId] = imgFile
+        self.imagesFile.flush()
+        os.fsync(self.imagesFile.fileno())
+
+        self.pending = []
+        self.nPending = 0
+
+    def close(self):
+        """
+        Write pending records and consolidate new table.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        with self.lock:
+            if self.imagesFile.closed:
+                return
+
+            self.writeChunk()
+            self.imagesFile.close()
+
+            # consolidating appended parts would rewrite the whole table
+            if not self.append:
+                consolidate(self.dir, self.fileFormat)
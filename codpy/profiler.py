@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import cProfile
+from contextlib import contextmanager, nullcontext
+
+
+# shared no-op context of disabled profilers
+_noStage = nullcontext()
+
+
+class Profiler():
+    """
+    Class of per-stage timers and counters for the detection pipeline.
+    Optionally captures a cProfile of the whole run. Disabled profilers
+    only cost a method call per stage.
+
+    """
+
+    def __init__(self, enabled = False, capture = False):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        enabled : bool, optional
+            enable stage timers and counters. The default is False.
+        capture : bool, optional
+            additionally capture cProfile of run. The default is False.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.enabled = enabled or capture
+        self.capture = capture
+        self.reset()
+
+    @classmethod
+    def fromSetting(cls, profile = None):
+        """
+        Construct profiler from setting. If no setting is given, it is read
+        from environment variable CODPY_PROFILE.
+
+        Parameters
+        ----------
+        profile : bool or string, optional
+            True or "1" to enable timers, "cprofile" to also capture
+            cProfile. The default is None.
+
+        Returns
+        -------
+        profiler : Profiler
+            profiler.
+
+        """
+
+        if profile is None:
+            profile = os.environ.get('CODPY_PROFILE', '')
+
+        if isinstance(profile, str):
+            profile = profile.strip().lower()
+            if profile == 'cprofile':
+                return cls(True, True)
+            return cls(profile in ('1', 'true', 'yes', 'on'))
+
+        return cls(bool(profile))
+
+    def __getstate__(self):
+        """
+        Get state for pickling. A running cProfile is not passed on.
+
+        Returns
+        -------
+        state : dict
+            object variables.
+
+        """
+
+        state = self.__dict__.copy()
+        state['prof'] = None
+
+        return state
+
+    def reset(self):
+        """
+        Reset all timers and counters.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.times = {}
+        self.calls = {}
+        self.counts = {}
+        self.wallTime = 0.
+        self.prof = None
+
+        # start of run, None if not started
+        self.t0 = None
+
+    def start(self):
+        """
+        Start profiling a run.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if not self.enabled:
+            return
+
+        self.reset()
+        self.t0 = time.perf_counter()
+
+        if self.capture:
+            self.prof = cProfile.Profile()
+            self.prof.enable()
+
+    def stop(self):
+        """
+        Stop profiling a run.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        # e.g. escaped from a run, which did not start profiling
+        if not self.enabled or self.t0 is None:
+            return
+
+        self.wallTime = time.perf_counter() - self.t0
+
+        if self.prof is not None:
+            self.prof.disable()
+
+    def stage(self, name):
+        """
+        Get context timing a pipeline stage.
+
+        Parameters
+        ----------
+        name : string
+            stage name.
+
+        Returns
+        -------
+        context : context manager
+            timing context.
+
+        """
+
+        if not self.enabled:
+            return _noStage
+
+        return self._timeStage(name)
+
+    @contextmanager
+    def _timeStage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.) + time.perf_counter() - t0
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, value = 1):
+        """
+        Add to a counter.
+
+        Parameters
+        ----------
+        name : string
+            counter name.
+        value : int, optional
+            value to add. The default is 1.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def pop(self):
+        """
+        Get and reset timers and counters, e.g. to pass them from a worker
+        process to the main process.
+
+        Returns
+        -------
+        stats : tuple or None
+            times, calls and counts. None, if disabled.
+
+        """
+
+        if not self.enabled:
+            return None
+
+        stats = (self.times, self.calls, self.counts)
+        self.times = {}
+        self.calls = {}
+        self.counts = {}
+
+        return stats
+
+    def merge(self, stats):
+        """
+        Add timers and counters of another profiler.
+
+        Parameters
+        ----------
+        stats : tuple or None
+            times, calls and counts, as returned by pop.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if stats is None:
+            return
+
+        times, calls, counts = stats
+
+        for name in times:
+            self.times[name] = self.times.get(name, 0.) + times[name]
+            self.calls[name] = self.calls.get(name, 0) + calls[name]
+        for name in counts:
+            self.counts[name] = self.counts.get(name, 0) + counts[name]
+
+    def save(self, outDir):
+        """
+        Save timers and counters to profile.dat and captured cProfile to
+        profile.prof in output directory.
+
+        Parameters
+        ----------
+        outDir : string
+            path to output directory.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if not self.enabled:
+            return
+
+        # check, if output dir exists
+        if not os.path.isdir(outDir):
+            os.makedirs(outDir)
+
+        with open(os.path.join(outDir, 'profile.dat'), 'w') as profFile:
+            profFile.write('stage nCalls totalTime meanTime\n')
+            for name, total in self.times.items():
+                n = self.calls[name]
+                profFile.write(name + ' ' + str(n) + ' ' + str(total) + ' ' +
+                               str(total / n) + '\n')
+
+            profFile.write('counter value\n')
+            for name, value in self.counts.items():
+                profFile.write(name + ' ' + str(value) + '\n')
+
+            profFile.write('wallTime ' + str(self.wallTime) + '\n')
+            if self.wallTime > 0 and 'images' in self.counts:
+                profFile.write('imgPerSec ' +
+                               str(self.counts['images'] / self.wallTime) + '\n')
+
+        if self.prof is not None:
+            self.prof.dump_stats(os.path.join(outDir, 'profile.prof'))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+# record of a detected object
+# x, y : object center, i.e. top-left corner of bounding box
+# w, h : bounding box width and height
+# cx, cy : object centroid
+# area : object area
+# perimeter : object perimeter
+# meanH : mean H color value
+# colored : colored object
+# manual : manually added or (de-) selected
+objDtype = np.dtype([('x', np.int32),
+                     ('y', np.int32),
+                     ('w', np.int32),
+                     ('h', np.int32),
+                     ('cx', np.float32),
+                     ('cy', np.float32),
+                     ('area', np.float32),
+                     ('perimeter', np.float32),
+                     ('meanH', np.float64),
+                     ('colored', np.bool_),
+                     ('manual', np.bool_)])
+
+
+def newObjects(n = 0):
+    """
+    Get empty object records.
+
+    Parameters
+    ----------
+    n : int, optional
+        number of objects. The default is 0.
+
+    Returns
+    -------
+    objs : numpy array
+        object records.
+
+    """
+
+    objs = np.zeros(n, objDtype)
+    objs['meanH'] = np.nan
+
+    return objs
+
+
+def objCenters(objs):
+    """
+    Get centers of uncolored and colored objects as lists.
+
+    Parameters
+    ----------
+    objs : numpy array
+        object records.
+
+    Returns
+    -------
+    uncObjCen : list
+        centers of uncolored objects.
+    colObjCen : list
+        centers of colored objects.
+
+    """
+
+    unc = objs[~objs['colored']]
+    col = objs[objs['colored']]
+
+    uncObjCen = list(zip(unc['x'].tolist(), unc['y'].tolist()))
+    colObjCen = list(zip(col['x'].tolist(), col['y'].tolist()))
+
+    return uncObjCen, colObjCen
+
+
+def updateObjects(objs, uncObjCen, colObjCen):
+    """
+    Update object records to manually (de-) selected centers. Records of
+    kept objects are reused. Objects changing color and new objects are
+    flagged as manual.
+
+    Parameters
+    ----------
+    objs : numpy array
+        object records before selection.
+    uncObjCen : list
+        centers of uncolored objects after selection.
+    colObjCen : list
+        centers of colored objects after selection.
+
+    Returns
+    -------
+    objs : numpy array
+        object records after selection.
+
+    """
+
+    # record indices by center
+    byCenter = {}
+    for i, center in enumerate(zip(objs['x'].tolist(), objs['y'].tolist())):
+        byCenter.setdefault(center, []).append(i)
+
+    updated = newObjects(len(uncObjCen) + len(colObjCen))
+
+    for j, center in enumerate(uncObjCen + colObjCen):
+        colored = j >= len(uncObjCen)
+        center = (int(center[0]), int(center[1]))
+        indices = byCenter.get(center)
+
+        if indices:
+            # kept object
+            updated[j] = objs[indices.pop(0)]
+            if updated[j]['colored'] != colored:
+                updated[j]['manual'] = True
+        else:
+            # manually added object
+            updated[j]['x'], updated[j]['y'] = center
+            updated[j]['cx'], updated[j]['cy'] = center
+            updated[j]['manual'] = True
+
+        updated[j]['colored'] = colored
+
+    return updated
@@ -50,9 +50,95 @@ class Selector():
         self.boxColorColObj = (0, 0, 255)
 
         # needed as object variables for use in escape method
-        self.results = []
+        self.resWriter = None
         self.outDir = ""
         
+    def __getstate__(self):
+        """
+        Get state for pickling, e.g. to send selector to worker processes.
+        The open results writer is not passed on.
+
+        Returns
+        -------
+        state : dict
+            object variables.
+
+        """
+        
+        state = self.__dict__.copy()
+        state['resWriter'] = None
+        
+        return state
+    
+    def openResults(self, inDir, imgFiles, resume = False, recorded = None):
+        """
+        Open results writer in output directory. When resuming, images
+        already processed in a previous run are skipped, as long as they
+        are unchanged and their output image exists.
+
+        Parameters
+        ----------
+        inDir : string
+            absolute input directory.
+        imgFiles : iterable
+            input image filenames.
+        resume : bool, optional
+            resume previous run. The default is False.
+        recorded : set, optional
+            images with further output, e.g. object records. Other images
+            are processed again. The default is None, i.e. no further output.
+
+        Returns
+        -------
+        imgFiles : iterable
+            input image filenames still to process, enumerated lazily.
+
+        """
+        
+        if not resume:
+            self.resWriter = fh.ResultsWriter(self.outDir)
+            return imgFiles
+        
+        # stamps of images processed before
+        index = fh.readIndex(self.outDir)
+        
+        done = set()
+        kept = set()
+        
+        for imgFile, stamp in index.items():
+            # keep results of removed images
+            if not os.path.isfile(os.path.join(inDir, imgFile)):
+                kept.add(imgFile)
+                continue
+            
+            # unchanged images with output image are done
+            if (stamp == fh.imgStamp(inDir, imgFile) and
+                os.path.isfile(fh.imgOutPath(self.outDir, imgFile)) and
+                (recorded is None or imgFile in recorded)):
+                done.add(imgFile)
+        
+        # remove results of images to process again, including unindexed
+        # results of older or interrupted runs
+        fh.keepResults(self.outDir, done | kept)
+        
+        self.resWriter = fh.ResultsWriter(self.outDir, append = True)
+        
+        return (imgFile for imgFile in imgFiles if imgFile not in done)
+    
+    def closeResults(self):
+        """
+        Close results writer, if opened.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        if self.resWriter is not None:
+            self.resWriter.close()
+            self.resWriter = None
+        
     def escape(self):
         """
         Manually escape from process, saving results until here.
@@ -66,8 +152,8 @@ class Selector():
         # close remaining windows
         cv2.destroyAllWindows()
         
-        # save results to files
-        fh.saveResults(self.outDir, self.results)
+        # results until here are already written, close file
+        self.closeResults()
         
         # exit process
         sys.exit("Manually exited script.")
@@ -113,10 +199,11 @@ class Selector():
         cv2.setMouseCallback(title, mouseCallback.selectFixedROIs)
         
         while True:
-            # re-draw bounding boxes in each step
+            # re-draw bounding boxes, if changed
             mouseCallback.markROIs()
     
-            key = cv2.waitKey(1) & 0xFF
+            # wait for events instead of spinning
+            key = cv2.waitKey(20) & 0xFF
             
             # deselect all objects with "d"
             if key == ord("d"):
@@ -140,7 +227,47 @@ class Selector():
         
         return imgOut, uncObjCen, colObjCen
         
-    def select(self, relInDir='data', relOutDir = 'results'):
+    def markCenters(self,
+                    imgIn,
+                    uncObjCen = [],
+                    colObjCen = []):
+        """
+        Mark centers of colored and uncolored objects without any user
+        interaction or image windows.
+
+        Parameters
+        ----------
+        imgIn : numpy array
+            input image.
+        uncObjCen : list, optional
+            centers of uncloured objects. The default is [].
+        colObjCen : list, optional
+            centers of colored objects. The default is [].
+
+        Returns
+        -------
+        imgOut : numpy array
+            image with objects marked in it
+
+        """
+        
+        param = [self.boxSize,
+                 self.lineWidth,
+                 self.boxColorUncolObj,
+                 self.boxColorColObj]
+        
+        mouseCallback = Callbacks(imgIn, "", param)
+        mouseCallback.setCenters(uncObjCen, colObjCen)
+        mouseCallback.drawROIs()
+        
+        return mouseCallback.getImgOut()
+        
+    def select(self,
+               relInDir = 'data',
+               relOutDir = 'results',
+               resume = False,
+               patterns = None,
+               recursive = False):
         """
         colored object selection routine using mouse callbacks.
 
@@ -150,6 +277,14 @@ class Selector():
             relative input directory. The default is "data".
         relOutDir : string, optional
             relative output directory. The default is "results".
+        resume : bool, optional
+            skip unchanged images processed in a previous run.
+            The default is False.
+        patterns : list, optional
+            glob patterns of image paths to select. The default is None,
+            i.e. all images.
+        recursive : bool, optional
+            include images in subdirectories. The default is False.
             
         Returns
         -------
@@ -157,30 +292,36 @@ class Selector():
 
         """
 
-        # results to save
-        self.results = []
-        
         # absolute input and output directories
-        inDir = os.getcwd() + os.sep + relInDir
-        self.outDir = os.getcwd() + os.sep + relOutDir
+        inDir = os.path.abspath(relInDir)
+        self.outDir = os.path.abspath(relOutDir)
+        
+        # images in input dir, enumerated lazily
+        imgFiles = fh.iterImgs(inDir,
+                               patterns,
+                               recursive,
+                               exclude = (self.outDir,))
+        
+        # results are written to file image by image
+        imgFiles = self.openResults(inDir, imgFiles, resume)
             
-        # go through all images in input dir
-        for imgFile in os.listdir(inDir):
-            if imgFile.endswith('.jpg'):
+        # go through all images to process
+        for imgFile in imgFiles:
                 
-                # read input image
-                imgIn = fh.readImgIn(inDir, imgFile)
+            # read input image
+            imgIn = fh.readImgIn(inDir, imgFile)
 
-                # manually select objects
-                imgOut, uncObjCen, colObjCen = self.manuallySelectCenters(imgIn)
-                
-                fh.saveImgOut(self.outDir, imgFile, imgOut)
-                
-                # all object centers
-                centers = uncObjCen + colObjCen
+            # manually select objects
+            imgOut, uncObjCen, colObjCen = self.manuallySelectCenters(imgIn)
+            
+            fh.saveImgOut(self.outDir, imgFile, imgOut)
+            
+            # all object centers
+            centers = uncObjCen + colObjCen
 
-                # append results of image to list
-                self.results.append([imgFile, str(len(centers)), str(len(colObjCen))])
+            # write results of image to file
+            self.resWriter.write((imgFile, len(centers), len(colObjCen)),
+                                 fh.imgStamp(inDir, imgFile))
             
-        # save results and used parameters to files
-        fh.saveResults(self.outDir, self.results)
+        # close results file
+        self.closeResults()
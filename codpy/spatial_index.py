@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+class SpatialIndex():
+    """
+    Class of grid-based spatial index of box centers in several classes.
+    Centers are bucketed into square grid cells of box size, so that boxes
+    containing a point are found among the centers of neighbouring cells.
+    Coordinates, classes and insertion order are kept in arrays.
+
+    """
+
+    def __init__(self, boxSize, capacity = 64):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        boxSize : float
+            side length of boxes, used as grid cell size.
+        capacity : int, optional
+            initial number of centers to store. The default is 64.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.boxSize = boxSize
+        self.cellSize = max(boxSize, 1)
+
+        # array storage, class -1 marks removed centers
+        self.xs = np.zeros(capacity, np.float64)
+        self.ys = np.zeros(capacity, np.float64)
+        self.cls = np.full(capacity, -1, np.int8)
+        self.seq = np.zeros(capacity, np.int64)
+        self.items = [None] * capacity
+        self.n = 0
+
+        # next sequence number, gives order of centers in each class
+        self.nextSeq = 0
+
+        # ids of centers in each grid cell
+        self.grid = {}
+
+    def cell(self, x, y):
+        """
+        Get grid cell of point.
+
+        Parameters
+        ----------
+        x : float
+            x-coordinate.
+        y : float
+            y-coordinate.
+
+        Returns
+        -------
+        cell : tuple
+            grid cell indices.
+
+        """
+
+        return (int(np.floor(x / self.cellSize)),
+                int(np.floor(y / self.cellSize)))
+
+    def insert(self, center, cls):
+        """
+        Insert center as last one of its class.
+
+        Parameters
+        ----------
+        center : tuple
+            box center.
+        cls : int
+            class of center.
+
+        Returns
+        -------
+        i : int
+            id of center.
+
+        """
+
+        # grow storage
+        if self.n == len(self.xs):
+            capacity = 2 * len(self.xs)
+            self.xs = np.resize(self.xs, capacity)
+            self.ys = np.resize(self.ys, capacity)
+            self.seq = np.resize(self.seq, capacity)
+            classes = np.full(capacity, -1, np.int8)
+            classes[:self.n] = self.cls
+            self.cls = classes
+            self.items.extend([None] * (capacity - self.n))
+
+        i = self.n
+        self.n += 1
+
+        self.xs[i] = center[0]
+        self.ys[i] = center[1]
+        self.items[i] = center
+        self.cls[i] = cls
+        self.seq[i] = self.nextSeq
+        self.nextSeq += 1
+
+        self.grid.setdefault(self.cell(center[0], center[1]), []).append(i)
+
+        return i
+
+    def remove(self, i):
+        """
+        Remove center.
+
+        Parameters
+        ----------
+        i : int
+            id of center.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.grid[self.cell(self.xs[i], self.ys[i])].remove(i)
+        self.cls[i] = -1
+        self.items[i] = None
+
+    def move(self, i, cls):
+        """
+        Move center to end of another class.
+
+        Parameters
+        ----------
+        i : int
+            id of center.
+        cls : int
+            new class of center.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.cls[i] = cls
+        self.seq[i] = self.nextSeq
+        self.nextSeq += 1
+
+    def near(self, x, y, reach):
+        """
+        Get ids of centers within reach of point in both directions.
+
+        Parameters
+        ----------
+        x : float
+            x-coordinate.
+        y : float
+            y-coordinate.
+        reach : float
+            maximum distance in x- and y-direction.
+
+        Returns
+        -------
+        ids : numpy array
+            ids of centers, ordered by class and sequence.
+
+        """
+
+        cx0, cy0 = self.cell(x - reach, y - reach)
+        cx1, cy1 = self.cell(x + reach, y + reach)
+
+        ids = [i
+               for cx in range(cx0, cx1 + 1)
+               for cy in range(cy0, cy1 + 1)
+               for i in self.grid.get((cx, cy), ())]
+        ids = np.array(ids, np.intp)
+
+        ids = ids[(np.abs(self.xs[ids] - x) <= reach) &
+                  (np.abs(self.ys[ids] - y) <= reach)]
+
+        return ids[np.lexsort((self.seq[ids], self.cls[ids]))]
+
+    def hit(self, x, y, cls):
+        """
+        Get first center of class, whose box contains point.
+
+        Parameters
+        ----------
+        x : float
+            x-coordinate.
+        y : float
+            y-coordinate.
+        cls : int
+            class of center.
+
+        Returns
+        -------
+        i : int or None
+            id of center. None, if no box contains point.
+
+        """
+
+        ids = self.near(x, y, self.boxSize / 2)
+
+        # boxes strictly containing point
+        ids = ids[(self.cls[ids] == cls) &
+                  (x > self.xs[ids] - self.boxSize / 2) &
+                  (y > self.ys[ids] - self.boxSize / 2) &
+                  (x < self.xs[ids] + self.boxSize / 2) &
+                  (y < self.ys[ids] + self.boxSize / 2)]
+
+        if len(ids) == 0:
+            return None
+
+        # earliest in class order
+        return ids[np.argmin(self.seq[ids])]
+
+    def centers(self, cls):
+        """
+        Get all centers of class in order.
+
+        Parameters
+        ----------
+        cls : int
+            class of centers.
+
+        Returns
+        -------
+        centers : list
+            centers of class.
+
+        """
+
+        ids = np.flatnonzero(self.cls[:self.n] == cls)
+        ids = ids[np.argsort(self.seq[ids])]
+
+        return [self.items[i] for i in ids]
+
+    def coords(self, cls):
+        """
+        Get coordinates of all centers of class, in no particular order.
+
+        Parameters
+        ----------
+        cls : int
+            class of centers.
+
+        Returns
+        -------
+        coords : numpy array
+            center coordinates with shape (n, 2).
+
+        """
+
+        ids = np.flatnonzero(self.cls[:self.n] == cls)
+
+        return np.stack((self.xs[ids], self.ys[ids]), 1)
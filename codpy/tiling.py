@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+def iterTiles(height, width, tileSize, overlap = 0):
+    """
+    Iterate over overlapping tiles of an image. Tile cores form a regular
+    grid of tile size, partitioning the image. Each tile extends its core
+    by overlap on all sides, clipped to the image.
+
+    Parameters
+    ----------
+    height : int
+        image height.
+    width : int
+        image width.
+    tileSize : int
+        side length of tile cores.
+    overlap : int, optional
+        overlap added on each side of tile cores. The default is 0.
+
+    Yields
+    ------
+    tile : tuple
+        tile extent (x0, y0, x1, y1).
+    core : tuple
+        tile core (x0, y0, x1, y1).
+
+    """
+
+    for cy0 in range(0, height, tileSize):
+        for cx0 in range(0, width, tileSize):
+            cx1 = min(cx0 + tileSize, width)
+            cy1 = min(cy0 + tileSize, height)
+
+            tile = (max(cx0 - overlap, 0),
+                    max(cy0 - overlap, 0),
+                    min(cx1 + overlap, width),
+                    min(cy1 + overlap, height))
+
+            yield tile, (cx0, cy0, cx1, cy1)
+
+
+def ownObjects(objs, tile, core):
+    """
+    Shift object records of a tile to image coordinates and keep only the
+    objects, whose centroids lie within the tile core. As cores partition
+    the image, each object is kept by exactly one tile, as long as it is
+    smaller than the overlap.
+
+    Parameters
+    ----------
+    objs : numpy array
+        object records in tile coordinates.
+    tile : tuple
+        tile extent (x0, y0, x1, y1).
+    core : tuple
+        tile core (x0, y0, x1, y1).
+
+    Returns
+    -------
+    objs : numpy array
+        owned object records in image coordinates.
+
+    """
+
+    objs = objs.copy()
+
+    objs['x'] += tile[0]
+    objs['y'] += tile[1]
+    objs['cx'] += tile[0]
+    objs['cy'] += tile[1]
+
+    # centroid in core, rounded like pixel coordinates
+    cx = np.floor(objs['cx'] + 0.5)
+    cy = np.floor(objs['cy'] + 0.5)
+    owned = ((cx >= core[0]) & (cx < core[2]) &
+             (cy >= core[1]) & (cy < core[3]))
+
+    return objs[owned]
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+class Workspace():
+    """
+    Class of named scratch buffers reused across images. Each buffer is a
+    flat byte array, which only grows, so that images of same or smaller
+    size, e.g. consecutive images or tiles, get views of existing memory
+    instead of fresh allocations.
+
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.buffers = {}
+
+    def __getstate__(self):
+        """
+        Drop buffers when pickling, e.g. for worker processes.
+
+        Returns
+        -------
+        state : dict
+            picklable state.
+
+        """
+
+        return {'buffers': {}}
+
+    def buffer(self, name, shape, dtype = np.uint8):
+        """
+        Get scratch buffer. Contents are undefined and only valid until the
+        next request of the same name.
+
+        Parameters
+        ----------
+        name : string
+            name of buffer.
+        shape : tuple
+            shape of buffer.
+        dtype : numpy dtype, optional
+            data type of buffer. The default is np.uint8.
+
+        Returns
+        -------
+        buf : numpy array
+            contiguous array of given shape and data type.
+
+        """
+
+        dtype = np.dtype(dtype)
+        nBytes = int(np.prod(shape)) * dtype.itemsize
+
+        store = self.buffers.get(name)
+
+        # grow buffer
+        if store is None or store.nbytes < nBytes:
+            store = np.empty(nBytes, np.uint8)
+            self.buffers[name] = store
+
+        return store[:nBytes].view(dtype).reshape(shape)
+
+    def nbytes(self):
+        """
+        Get total size of all buffers.
+
+        Returns
+        -------
+        nBytes : int
+            size in bytes.
+
+        """
+
+        return sum(store.nbytes for store in self.buffers.values())
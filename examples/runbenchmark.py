@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from codpy.contour_detector import ContourDetector
+from codpy.benchmark import benchmark
+
+detector = ContourDetector(meanRefH = 170,
+                           stdRefH = 10,
+                           boxSize = 30.)
+
+report = benchmark(detector,
+                   sizes = [(512, 512), (2048, 2048), (4096, 4096)],
+                   densities = [10, 100, 1000],
+                   outPath = 'benchmark.json')
+
+for case in report['cases']:
+    print(case['height'], case['width'], case['density'],
+          round(case['imgPerSec'], 2), case['peakMemory'])
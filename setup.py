@@ -16,4 +16,7 @@ setup(
     description='automated coloured object detection',
     author='Niklas Guenther',
     author_email='gnthrn@gmail.com',
-    packages=['codpy'])
+    packages=['codpy'],
+    extras_require={'parquet': ['pyarrow']},
+    entry_points={
+        'console_scripts': ['codpy-detect=codpy.cli:main']})
@@ -0,0 +1,24 @@
+"""
+Tests of the on-disk contour cache.
+"""
+
+
+import numpy as np
+
+from codpy.contour_cache import ContourCache
+from codpy.contour_detector import ContourDetector
+
+
+def test_empty_entry_round_trip(tmp_path):
+    cache = ContourCache(str(tmp_path))
+    cache.save('empty', [])
+
+    assert cache.load('empty') == []
+
+
+def test_blank_image_cached_twice(tmp_path):
+    imgIn = np.full((64, 64, 3), 255, np.uint8)
+
+    for _ in range(2):
+        detector = ContourDetector(cacheDir = str(tmp_path))
+        assert len(detector.detectObjects(imgIn)) == 0
@@ -0,0 +1,85 @@
+"""
+Tests of contour geometry.
+"""
+
+
+import os
+
+import numpy as np
+import cv2
+
+from codpy.contour_detector import ContourDetector
+
+
+examplesDir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'examples')
+
+
+def noiseContours():
+    """
+    Contours of a noise image, followed by a single point, a horizontal
+    line and a vertical line contour without area.
+    """
+
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (120, 160, 3), np.uint8)
+    contours, _ = cv2.findContours(cv2.Canny(img, 50, 150),
+                                   cv2.RETR_LIST,
+                                   cv2.CHAIN_APPROX_SIMPLE)
+
+    return list(contours) + [np.array([[[5, 7]]], np.int32),
+                             np.array([[[1, 1]], [[4, 1]], [[8, 1]]], np.int32),
+                             np.array([[[2, 2]], [[2, 9]]], np.int32)]
+
+
+def test_extract_objects_matches_opencv():
+    contours = noiseContours()
+    objs = ContourDetector().extractObjects(contours)
+
+    boxes = np.array([cv2.boundingRect(c) for c in contours])
+    areas = np.array([cv2.contourArea(c) for c in contours])
+    perimeters = np.array([cv2.arcLength(c, True) for c in contours])
+
+    # centroids from moments, mean of points without area
+    centroids = []
+    for contour in contours:
+        m = cv2.moments(contour)
+        if m['m00'] != 0:
+            centroids.append((m['m10'] / m['m00'], m['m01'] / m['m00']))
+        else:
+            centroids.append(contour.reshape(-1, 2).mean(axis = 0))
+    centroids = np.array(centroids)
+
+    assert (areas == 0).sum() > 3
+
+    np.testing.assert_array_equal(objs['x'], boxes[:, 0])
+    np.testing.assert_array_equal(objs['y'], boxes[:, 1])
+    np.testing.assert_array_equal(objs['w'], boxes[:, 2])
+    np.testing.assert_array_equal(objs['h'], boxes[:, 3])
+    np.testing.assert_allclose(objs['area'], areas, rtol = 1e-6)
+    np.testing.assert_allclose(objs['perimeter'], perimeters, rtol = 1e-6)
+    np.testing.assert_allclose(objs['cx'], centroids[:, 0], atol = 1e-4)
+    np.testing.assert_allclose(objs['cy'], centroids[:, 1], atol = 1e-4)
+
+
+def test_extract_objects_of_single_point():
+    objs = ContourDetector().extractObjects([np.array([[[5, 7]]], np.int32)])
+
+    assert (objs['x'][0], objs['y'][0], objs['w'][0], objs['h'][0]) == (5, 7, 1, 1)
+    assert (objs['cx'][0], objs['cy'][0]) == (5, 7)
+    assert objs['area'][0] == 0
+    assert objs['perimeter'][0] == 0
+
+
+def test_compare_scale_keeps_profiles_apart(tmp_path):
+    detector = ContourDetector(meanRefH = 170,
+                               stdRefH = 10,
+                               boxSize = 30.,
+                               scale = 0.5,
+                               profile = True)
+
+    detector.compareScale(relInDir = os.path.join(examplesDir, 'data'),
+                          relOutDir = str(tmp_path))
+
+    # full resolution detection is not timed into profile of detector
+    assert detector.profiler.calls['extractContours'] == 3
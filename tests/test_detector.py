@@ -0,0 +1,99 @@
+"""
+Tests of object detection.
+"""
+
+
+import os
+
+import numpy as np
+import cv2
+
+from codpy.contour_detector import ContourDetector
+
+
+examplesDir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'examples')
+
+
+def fadingDisk(nFrames = 40, step = 5):
+    """
+    Frames of a disk on white background, which darkens by step per frame.
+    """
+
+    for i in range(nFrames):
+        frame = np.full((256, 256, 3), 255, np.uint8)
+        value = 255 - step * i
+        cv2.circle(frame, (128, 128), 20, (value, value, value), -1)
+        yield frame
+
+
+def test_gradual_change_is_detected():
+    detector = ContourDetector()
+
+    full = [len(objs) for _, objs, _, _ in
+            detector.streamObjects(fadingDisk())]
+    reused = [len(objs) for _, objs, _, _ in
+              detector.streamObjects(fadingDisk(),
+                                     regionSize = 128,
+                                     diffThresh = 10)]
+
+    assert full[-1] > 0
+    assert reused == full
+
+
+def referenceMeanH(imgHSV, contours):
+    """
+    Mean H value of each contour, filled separately.
+    """
+
+    meanH = []
+    for contour in contours:
+        mask = np.zeros(imgHSV.shape[:2], np.uint8)
+        cv2.drawContours(mask, [contour], 0, 255, -1)
+        meanH.append(cv2.mean(imgHSV[:, :, 0], mask)[0])
+
+    return np.array(meanH)
+
+
+def nestedRings():
+    """
+    Image of nested colored rings and a filled ellipse in a box.
+    """
+
+    img = np.full((200, 300, 3), 255, np.uint8)
+    cv2.circle(img, (80, 100), 60, (0, 0, 200), 8)
+    cv2.circle(img, (80, 100), 35, (200, 0, 0), 6)
+    cv2.circle(img, (80, 100), 12, (0, 200, 0), -1)
+    cv2.rectangle(img, (180, 40), (270, 160), (0, 150, 150), 5)
+    cv2.ellipse(img, (225, 100), (20, 30), 30, 0, 360, (150, 0, 150), -1)
+
+    return img
+
+
+def test_mean_contour_h_of_nested_rings():
+    img = nestedRings()
+    imgHSV = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    contours, _ = cv2.findContours(cv2.Canny(img, 50, 150),
+                                   cv2.RETR_LIST,
+                                   cv2.CHAIN_APPROX_SIMPLE)
+
+    detector = ContourDetector()
+
+    # rings give several nested contours each
+    assert len(contours) > 10
+    np.testing.assert_allclose(detector.meanContourH(imgHSV, contours),
+                               referenceMeanH(imgHSV, contours),
+                               atol = 1e-9)
+
+
+def test_mean_contour_h_of_examples():
+    detector = ContourDetector(meanRefH = 170, stdRefH = 10, boxSize = 30.)
+
+    for imgFile in sorted(os.listdir(os.path.join(examplesDir, 'data'))):
+        img = cv2.imread(os.path.join(examplesDir, 'data', imgFile))
+        imgHSV = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        contours = detector.extractContours(img)
+
+        np.testing.assert_allclose(detector.meanContourH(imgHSV, contours),
+                                   referenceMeanH(imgHSV, contours),
+                                   atol = 1e-9)
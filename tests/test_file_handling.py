@@ -0,0 +1,23 @@
+"""
+Tests of input image enumeration.
+"""
+
+
+import os
+
+import numpy as np
+import cv2
+
+import codpy.file_handling as fh
+
+
+def test_recursive_skips_symlink_loops(tmp_path):
+    os.makedirs(str(tmp_path / 'data' / 'plate'))
+    img = np.zeros((8, 8, 3), np.uint8)
+    cv2.imwrite(str(tmp_path / 'data' / 'a.png'), img)
+    cv2.imwrite(str(tmp_path / 'data' / 'plate' / 'b.png'), img)
+    os.symlink('..', str(tmp_path / 'data' / 'plate' / 'loop'))
+
+    imgFiles = list(fh.iterImgs(str(tmp_path / 'data'), recursive = True))
+
+    assert imgFiles == ['a.png', 'plate/b.png']
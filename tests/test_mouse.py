@@ -0,0 +1,116 @@
+"""
+Tests of box drawing and selection by mouseclick.
+"""
+
+
+import numpy as np
+import cv2
+import pytest
+
+from codpy.mouse import Callbacks, drawBoxes
+
+
+def drawRectangles(img, centers, boxSize, color, lineWidth, offset = (0, 0)):
+    """
+    Draw boxes one by one with cv2.rectangle.
+    """
+
+    for x, y in centers:
+        cv2.rectangle(img,
+                      (int(x - boxSize/2) - offset[0], int(y - boxSize/2) - offset[1]),
+                      (int(x + boxSize/2) - offset[0], int(y + boxSize/2) - offset[1]),
+                      color,
+                      lineWidth)
+
+
+@pytest.mark.parametrize('boxSize', [30., 12.5, 7.3])
+@pytest.mark.parametrize('lineWidth', [1, 2, 3, 5])
+@pytest.mark.parametrize('offset', [(0, 0), (17, 9)])
+def test_draw_boxes_matches_rectangles(boxSize, lineWidth, offset):
+    rng = np.random.default_rng(lineWidth)
+
+    # centers inside, near and outside image border
+    centers = np.concatenate((rng.uniform(-20, 140, (50, 2)),
+                              [[0, 0], [99.5, 79.5], [-3.7, 40.2], [105.1, -2.4]]))
+
+    img = np.zeros((80, 100, 3), np.uint8)
+    ref = np.zeros((80, 100, 3), np.uint8)
+
+    drawBoxes(img, centers, boxSize, (0, 0, 255), lineWidth, offset)
+    drawRectangles(ref, centers, boxSize, (0, 0, 255), lineWidth, offset)
+
+    np.testing.assert_array_equal(img, ref)
+
+
+class ListReference():
+    """
+    Selection by mouseclick on plain lists of centers, first hit in list
+    order wins.
+    """
+
+    def __init__(self, boxSize, NoROICenters, ROICenters):
+        self.boxSize = boxSize
+        self.NoROICenters = list(NoROICenters)
+        self.ROICenters = list(ROICenters)
+
+    def hit(self, centers, center):
+        for i, c in enumerate(centers):
+            if (abs(center[0] - c[0]) < self.boxSize/2 and
+                abs(center[1] - c[1]) < self.boxSize/2):
+                return i
+        return None
+
+    def select(self, center):
+        i = self.hit(self.NoROICenters, center)
+        if i is None:
+            self.NoROICenters.append(center)
+        else:
+            self.ROICenters.append(self.NoROICenters.pop(i))
+
+    def deselect(self, center):
+        i = self.hit(self.ROICenters, center)
+        if i is not None:
+            self.NoROICenters.append(self.ROICenters.pop(i))
+            return
+
+        i = self.hit(self.NoROICenters, center)
+        if i is not None:
+            del self.NoROICenters[i]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_selection_matches_list_reference(seed):
+    rng = np.random.default_rng(seed)
+    boxSize = [10, 15., 22.5][seed % 3]
+
+    img = rng.integers(0, 256, (90, 120, 3), np.uint8)
+    callbacks = Callbacks(img, '', [boxSize, 1 + seed % 3, (125, 125, 125), (0, 0, 255)])
+
+    # overlapping initial boxes
+    NoROICenters = [tuple(c) for c in rng.integers(0, 120, (15, 2)).tolist()]
+    ROICenters = [tuple(c) for c in rng.integers(0, 90, (10, 2)).tolist()]
+    callbacks.setCenters(NoROICenters, ROICenters)
+    callbacks.drawROIs()
+    reference = ListReference(boxSize, NoROICenters, ROICenters)
+
+    for _ in range(100):
+        event = rng.choice([cv2.EVENT_LBUTTONDOWN, cv2.EVENT_RBUTTONDOWN])
+        x, y = (int(v) for v in rng.integers(-5, 125, 2))
+
+        callbacks.selectFixedROIs(event, x, y, None, None)
+        if event == cv2.EVENT_LBUTTONDOWN:
+            reference.select((x, y))
+        else:
+            reference.deselect((x, y))
+
+        assert callbacks.getCenters() == (reference.NoROICenters,
+                                          reference.ROICenters)
+
+        # partial re-drawing equals full re-drawing
+        for center in callbacks.changed:
+            callbacks.redrawROIs(center)
+        callbacks.changed = []
+
+        imgOut = callbacks.getImgOut().copy()
+        callbacks.drawROIs()
+        np.testing.assert_array_equal(imgOut, callbacks.getImgOut())
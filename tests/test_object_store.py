@@ -0,0 +1,124 @@
+"""
+Tests of the object table.
+"""
+
+
+import os
+
+import numpy as np
+import pytest
+
+import codpy.records as rec
+import codpy.file_handling as fh
+from codpy.object_store import ObjectWriter, consolidate, loadObjects, tableDir
+
+
+def records(n):
+    objs = rec.newObjects(n)
+    objs['area'] = np.arange(n)
+    return objs
+
+
+def test_resumed_run_appends_parts(tmp_path):
+    outDir = str(tmp_path)
+    objDir = os.path.join(outDir, 'objects')
+
+    with ObjectWriter(outDir) as writer:
+        writer.write('a.png', records(2))
+        writer.write('b.png', records(3))
+
+    consolidated = sorted(os.listdir(objDir))
+
+    # image b processed again
+    with ObjectWriter(outDir, append = True) as writer:
+        writer.write('b.png', records(4))
+
+    # consolidated table is kept, new records are added as part
+    assert all(name in os.listdir(objDir) for name in consolidated)
+    assert any(name.startswith('part_') for name in os.listdir(objDir))
+
+    images, table = loadObjects(outDir)
+    assert sorted(images.values()) == ['a.png', 'b.png']
+    assert len(table['imgId']) == 6
+
+    consolidate(objDir)
+    assert not any(name.startswith('part_') for name in os.listdir(objDir))
+
+    images, table = loadObjects(outDir)
+    assert isinstance(table['imgId'], np.memmap)
+    assert len(table['imgId']) == 6
+
+
+def test_interrupted_consolidation(tmp_path, monkeypatch):
+    outDir = str(tmp_path)
+    objDir = os.path.join(outDir, 'objects')
+
+    with ObjectWriter(outDir) as writer:
+        writer.write('a.png', records(2))
+
+    with ObjectWriter(outDir, append = True) as writer:
+        writer.write('b.png', records(3))
+
+    # crash after writing columns, before switching to them
+    writeAtomic = fh.writeAtomic
+
+    def crash(path, lines):
+        if path.endswith('table.txt'):
+            raise KeyboardInterrupt
+        writeAtomic(path, lines)
+
+    monkeypatch.setattr(fh, 'writeAtomic', crash)
+    with pytest.raises(KeyboardInterrupt):
+        consolidate(objDir)
+    monkeypatch.undo()
+
+    images, table = loadObjects(outDir)
+    assert len(table['imgId']) == 5
+
+    consolidate(objDir)
+
+    images, table = loadObjects(outDir)
+    assert all(len(column) == 5 for column in table.values())
+
+
+def test_columns_of_different_length(tmp_path):
+    outDir = str(tmp_path)
+    objDir = os.path.join(outDir, 'objects')
+
+    with ObjectWriter(outDir) as writer:
+        writer.write('a.png', records(2))
+
+    path = os.path.join(tableDir(objDir), 'x.npy')
+    np.save(path, np.load(path)[:1])
+
+    with pytest.raises(ValueError):
+        loadObjects(outDir)
+
+
+def test_parquet_resumed_run(tmp_path):
+    pytest.importorskip('pyarrow')
+
+    outDir = str(tmp_path)
+    objDir = os.path.join(outDir, 'objects')
+
+    with ObjectWriter(outDir, fileFormat = 'parquet') as writer:
+        writer.write('a.png', records(2))
+        writer.write('b.png', records(3))
+
+    assert os.path.isfile(os.path.join(objDir, 'objects.parquet'))
+
+    # image b processed again
+    with ObjectWriter(outDir, append = True, fileFormat = 'parquet') as writer:
+        writer.write('b.png', records(4))
+
+    images, table = loadObjects(outDir)
+    assert sorted(images.values()) == ['a.png', 'b.png']
+    assert len(table['imgId']) == 6
+    np.testing.assert_array_equal(np.sort(table['area']), [0, 0, 1, 1, 2, 3])
+
+    consolidate(objDir, 'parquet')
+    assert not any(name.startswith('part_') for name in os.listdir(objDir))
+
+    images, table = loadObjects(outDir, columns = ['imgId', 'area'])
+    assert len(table['imgId']) == 6
+    np.testing.assert_array_equal(np.sort(table['area']), [0, 0, 1, 1, 2, 3])
@@ -0,0 +1,29 @@
+"""
+Tests of the stage profiler.
+"""
+
+
+import cv2
+import pytest
+
+from codpy.profiler import Profiler
+from codpy.contour_detector import ContourDetector
+
+
+def test_stop_without_start():
+    profiler = Profiler(enabled = True)
+    profiler.stop()
+
+    assert profiler.wallTime == 0.
+
+
+def test_escape_without_started_profile(tmp_path, monkeypatch):
+    # no windows to close without display
+    monkeypatch.setattr(cv2, 'destroyAllWindows', lambda: None)
+
+    # as escaping from select, which does not start profiling
+    detector = ContourDetector(profile = True)
+    detector.outDir = str(tmp_path)
+
+    with pytest.raises(SystemExit):
+        detector.escape()
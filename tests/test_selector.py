@@ -0,0 +1,57 @@
+"""
+Tests of resuming runs.
+"""
+
+
+import os
+import shutil
+
+import codpy.file_handling as fh
+from codpy.contour_detector import ContourDetector
+
+
+examplesDir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'examples')
+
+
+def test_resume_drops_unindexed_results(tmp_path):
+    # results of earlier run without index
+    shutil.copytree(os.path.join(examplesDir, 'data'), str(tmp_path / 'data'))
+    shutil.copytree(os.path.join(examplesDir, 'results'), str(tmp_path / 'results'))
+
+    detector = ContourDetector(meanRefH = 170, stdRefH = 10, boxSize = 30.)
+
+    for _ in range(2):
+        detector.detect(relInDir = str(tmp_path / 'data'),
+                        relOutDir = str(tmp_path / 'results'),
+                        interactive = False,
+                        resume = True)
+
+    with open(str(tmp_path / 'results' / 'results.csv')) as resFile:
+        imgNames = [line.split()[0] for line in resFile.readlines()[1:]]
+
+    assert sorted(imgNames) == ['img00.jpg', 'img01.jpg', 'img02.jpg']
+
+
+def test_resume_skips_names_with_spaces(tmp_path):
+    os.makedirs(str(tmp_path / 'data' / 'plate 1'))
+    shutil.copy(os.path.join(examplesDir, 'data', 'img00.jpg'),
+                str(tmp_path / 'data' / 'img 00.jpg'))
+    shutil.copy(os.path.join(examplesDir, 'data', 'img01.jpg'),
+                str(tmp_path / 'data' / 'plate 1' / 'a.jpg'))
+
+    detector = ContourDetector(meanRefH = 170, stdRefH = 10, boxSize = 30.)
+
+    for _ in range(2):
+        detector.detect(relInDir = str(tmp_path / 'data'),
+                        relOutDir = str(tmp_path / 'results'),
+                        interactive = False,
+                        resume = True,
+                        recursive = True)
+
+    index = fh.readIndex(str(tmp_path / 'results'))
+    assert sorted(index) == ['img 00.jpg', 'plate 1/a.jpg']
+
+    # processed images are skipped, results are written once
+    with open(str(tmp_path / 'results' / 'results.csv')) as resFile:
+        assert len(resFile.readlines()) == 3